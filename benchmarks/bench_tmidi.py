@@ -0,0 +1,308 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+Throughput benchmarks for tmidi, run on desktop CPython.
+
+Replays synthetic byte streams (dense notes, CC floods, running status,
+SysEx and interleaved clock), or streams recorded to files, through
+``MIDI.receive()``, ``MIDI.receive_into()``, ``Message.__bytes__``,
+``MIDI.send()``, ``MIDI.send_many()`` and ``tmidi_router.Router``,
+and reports messages per second, bytes allocated per message
+and per-call latency percentiles.
+
+Allocations are measured with ``tracemalloc`` as the peak memory each call
+allocates. CPython boxes integers above 256, which MicroPython doesn't, so the
+``MIDI.stats`` counters are reset between the sampled calls to keep them small.
+
+Usage::
+
+    python benchmarks/bench_tmidi.py
+    python benchmarks/bench_tmidi.py --messages 50000 --output results.json
+    python benchmarks/bench_tmidi.py --stream recorded.mid.raw
+
+Results are also written as JSON with ``--output``, to compare versions.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import micropython  # noqa: F401, pylint: disable=unused-import
+except ImportError:
+    # stand-in for micropython.const when Blinka isn't installed
+    import types
+
+    micropython = types.ModuleType("micropython")
+    micropython.const = lambda value: value
+    sys.modules["micropython"] = micropython
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+import tmidi
+import tmidi_router
+
+
+class StreamPort:
+    """Port replaying a byte stream over and over, without allocating"""
+
+    def __init__(self, data):
+        # repeat short streams so most reads fill the whole buffer
+        self._file = io.BytesIO(bytes(data) * max(1, 4096 // max(1, len(data))))
+
+    def readinto(self, buf, nbytes=None):  # pylint: disable=unused-argument
+        count = self._file.readinto(buf)
+        if not count:
+            self._file.seek(0)
+            count = self._file.readinto(buf)
+        return count
+
+    def write(self, buf, nbytes=None):  # pylint: disable=unused-argument
+        return nbytes
+
+
+def make_streams():
+    """Synthetic streams, each a bytes object of whole messages"""
+    streams = {}
+
+    notes = bytearray()
+    for i in range(256):
+        note = 36 + i % 48
+        notes += bytes((0x90 | i % 16, note, 100, 0x80 | i % 16, note, 0))
+    streams["dense_notes"] = bytes(notes)
+
+    ccs = bytearray()
+    for i in range(512):
+        ccs += bytes((0xB0, i % 128, (i * 7) % 128))
+    streams["cc_flood"] = bytes(ccs)
+
+    running = bytearray((0xB0,))
+    for i in range(512):
+        running += bytes((1, i % 128))
+    streams["running_status"] = bytes(running)
+
+    sysex = bytearray()
+    for _ in range(8):
+        sysex += bytes((0xF0,)) + bytes(i % 128 for i in range(254)) + bytes((0xF7,))
+    streams["sysex"] = bytes(sysex)
+
+    clock = bytearray()
+    for i in range(256):
+        # clock bytes between the data bytes of a note
+        clock += bytes((0x90, 0xF8, 60 + i % 24, 0xF8, 100))
+    streams["interleaved_clock"] = bytes(clock)
+
+    return streams
+
+
+class OncePort:
+    """Port reading a byte stream once"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def readinto(self, buf, nbytes=None):
+        count = min(len(buf), len(self.data))
+        buf[:count] = self.data[:count]
+        self.data = self.data[count:]
+        return count
+
+
+def stream_message_count(data, **midi_args):
+    """Number of messages receive() gets from one pass over data"""
+    midi = tmidi.MIDI(midi_in=OncePort(data), **midi_args)
+    return len(list(midi.pending()))
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    return {
+        "p50_ns": samples[len(samples) // 2],
+        "p90_ns": samples[len(samples) * 9 // 10],
+        "p99_ns": samples[len(samples) * 99 // 100],
+        "max_ns": samples[-1],
+    }
+
+
+def run(name, call, count, msgs_per_call=1, latency_samples=2000, stats=None):
+    """Time count calls of call(), then sample per-call latency and allocation.
+    stats is the MIDI.stats of the MIDI object call() uses, if any."""
+    # warm up, so buffers and pools are in their steady state
+    for _ in range(min(count, 100)):
+        call()
+
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        call()
+    elapsed = time.perf_counter_ns() - start
+
+    latencies = []
+    for _ in range(min(count, latency_samples)):
+        t0 = time.perf_counter_ns()
+        call()
+        latencies.append(time.perf_counter_ns() - t0)
+
+    # bytes allocated and still live at the peak of each call
+    samples = min(count, 500)
+    tracemalloc.start()
+    alloc = 0
+    for _ in range(samples):
+        if stats:
+            stats.reset()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        alloc += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    msgs = count * msgs_per_call
+    result = {
+        "name": name,
+        "messages": round(msgs),
+        "msgs_per_sec": round(msgs * 1e9 / elapsed) if elapsed else 0,
+        "alloc_bytes_per_msg": round(alloc / (samples * msgs_per_call), 2),
+    }
+    result.update(percentiles(latencies))
+    return result
+
+
+def bench_stream(stream_name, data, count):
+    results = []
+    midi_args = {"enable_running_status": True, "sysex_buf": bytearray(64)}
+    msg_count = stream_message_count(data, **midi_args)
+    if not msg_count:
+        print("skipping %s: no MIDI messages in it" % stream_name)
+        return results
+
+    midi = tmidi.MIDI(midi_in=StreamPort(data), **midi_args)
+    results.append(run(stream_name + ":receive", midi.receive, count, stats=midi.stats))
+
+    midi = tmidi.MIDI(midi_in=StreamPort(data), pool_size=4, **midi_args)
+    results.append(
+        run(stream_name + ":receive_pooled", midi.receive, count, stats=midi.stats)
+    )
+
+    midi = tmidi.MIDI(midi_in=StreamPort(data), **midi_args)
+    msg = tmidi.Message()
+    results.append(
+        run(
+            stream_name + ":receive_into",
+            lambda: midi.receive_into(msg),
+            count,
+            stats=midi.stats,
+        )
+    )
+
+    midi = tmidi.MIDI(midi_in=StreamPort(data), **midi_args)
+    midi.on(tmidi.NOTE_ON, lambda channel, data0, data1: None)
+    midi.on(tmidi.CC, lambda channel, data0, data1: None)
+    results.append(
+        run(stream_name + ":poll", lambda: midi.poll(1), count, stats=midi.stats)
+    )
+
+    router = tmidi_router.Router()
+    router.add_route(StreamPort(data), StreamPort(b"\0"))
+    # one service() forwards one 64-byte read
+    msgs_per_read = msg_count * 64 / len(data)
+    results.append(
+        run(
+            stream_name + ":router",
+            router.service,
+            max(1, int(count / msgs_per_read)),
+            msgs_per_call=msgs_per_read,
+        )
+    )
+    return results
+
+
+def bench_send(count):
+    results = []
+    msgs = [tmidi.Message(tmidi.NOTE_ON, 60 + i, 100, channel=i) for i in range(16)]
+    msg = msgs[0]
+    results.append(run("message:__bytes__", msg.__bytes__, count))
+    buf = bytearray(3)
+    results.append(run("message:encode_into", lambda: msg.encode_into(buf), count))
+
+    midi = tmidi.MIDI(midi_out=StreamPort(b"\0"))
+    results.append(run("send", lambda: midi.send(msg), count))
+    results.append(
+        run("send_many", lambda: midi.send_many(msgs), count // 16, msgs_per_call=16)
+    )
+    midi = tmidi.MIDI(midi_out=StreamPort(b"\0"), enable_running_status_out=True)
+    results.append(
+        run(
+            "send_many_running_status",
+            lambda: midi.send_many(msgs),
+            count // 16,
+            msgs_per_call=16,
+        )
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--messages", type=int, default=20000, help="calls per benchmark"
+    )
+    parser.add_argument(
+        "--stream",
+        action="append",
+        default=[],
+        help="file of recorded raw MIDI bytes to replay, may be repeated",
+    )
+    parser.add_argument("--output", help="file to write JSON results to")
+    args = parser.parse_args()
+
+    streams = make_streams()
+    for path in args.stream:
+        with open(path, "rb") as file:
+            streams[os.path.basename(path)] = file.read()
+
+    results = []
+    for stream_name, data in streams.items():
+        results += bench_stream(stream_name, data, args.messages)
+    results += bench_send(args.messages)
+
+    print(
+        "%-40s %12s %10s %9s %9s %9s"
+        % ("benchmark", "msgs/sec", "alloc/msg", "p50 ns", "p99 ns", "max ns")
+    )
+    for result in results:
+        print(
+            "%-40s %12d %10.1f %9d %9d %9d"
+            % (
+                result["name"],
+                result["msgs_per_sec"],
+                result["alloc_bytes_per_msg"],
+                result.get("p50_ns", 0),
+                result.get("p99_ns", 0),
+                result.get("max_ns", 0),
+            )
+        )
+
+    if args.output:
+        report = {
+            "tmidi_version": tmidi.__version__,
+            "python": platform.python_implementation()
+            + " "
+            + platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+
+# This example shows how to receive MIDI from multiple devices with asyncio,
+# merging USB MIDI and serial MIDI into one stream and forwarding it
+# to both outputs while other tasks keep running.
+# The serial MIDI is connected to TX/RX pins on a Feather or QTPy.
+# You must wire up the needed resistors and MIDI jack yourself,
+# or use the MIDI Feather wing.
+
+import asyncio
+import time
+import board
+import busio
+import usb_midi
+
+import tmidi
+
+uart = busio.UART(rx=board.RX, tx=board.TX, baudrate=31250, timeout=0)
+midi_uart = tmidi.MIDI(midi_in=uart, midi_out=uart)
+midi_usb = tmidi.MIDI(midi_in=usb_midi.ports[0], midi_out=usb_midi.ports[1])
+
+
+async def forward_midi():
+    async for midi_in, msg in tmidi.Merge(midi_usb, midi_uart):
+        if midi_in is midi_usb:
+            print("usb:  %5.2f" % time.monotonic(), msg)
+            await midi_uart.send_async(msg)
+        else:
+            print("uart: %5.2f" % time.monotonic(), msg)
+            await midi_usb.send_async(msg)
+
+
+async def heartbeat():
+    while True:
+        print("waiting for midi on either usb or uart...")
+        await asyncio.sleep(1)
+
+
+async def main():
+    await asyncio.gather(forward_midi(), heartbeat())
+
+
+asyncio.run(main())
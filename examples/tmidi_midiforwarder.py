@@ -14,7 +14,7 @@ import usb_midi
 
 import tmidi
 
-uart = busio.UART(rx=board.RX, tx=board.TX, baudrate=31250, timeout=0.001)
+uart = busio.UART(rx=board.RX, tx=board.TX, baudrate=31250, timeout=0)
 midi_uart = tmidi.MIDI(midi_in=uart, midi_out=uart)
 midi_usb = tmidi.MIDI(midi_in=usb_midi.ports[0], midi_out=usb_midi.ports[1])
 
@@ -5,54 +5,62 @@
 # This example shows both receiving and sending MIDI messages
 # by implementing a simple arpeggiator.
 # MIDI notes send to MIDI In are arpeggiated to MIDI Output.
+# Arpeggiated notes are queued ahead of time with a Scheduler,
+# so their timing doesn't depend on how busy the loop is,
+# and pressed notes are tracked with a Tracker.
 
 import time
 import usb_midi
 import tmidi
+import tmidi_scheduler
+import tmidi_state
 
 midi = tmidi.MIDI(midi_in=usb_midi.ports[0], midi_out=usb_midi.ports[1])
 # if serial midi
-# uart = busio.UART(rx=board.RX, tx=board.TX, timeout=0.000)
+# uart = busio.UART(rx=board.RX, tx=board.TX, baudrate=31250, timeout=0)
 # midi = tmidi.MIDI(midi_in=uart, midi_out=uart)
+scheduler = tmidi_scheduler.Scheduler(midi)
 
 tempo = 120  # bpm
 notes_per_beat = 2  # 1 = quarter-note, 2 = 8th, 4 = 16th
-note_time = 60 / tempo / notes_per_beat
+note_time_ns = 60_000_000_000 // tempo // notes_per_beat
 gate_percent = 0.5
+gate_time_ns = int(note_time_ns * gate_percent)
 
+tracker = tmidi_state.Tracker()  # keeps track of which notes are pressed
 pressed_notes = []
 note_i = 0
-last_note_time = 0
-gate_time = 0
+next_note_time = 0
 while True:
     # handle midi input
     if msg := midi.receive():
-        if msg.type == tmidi.NOTE_ON and msg.velocity > 0:
-            print("note on", msg)
-            pressed_notes.append(msg.note)
-        elif msg.type == tmidi.NOTE_OFF or (
-            msg.type == tmidi.NOTE_ON and msg.velocity == 0
-        ):
-            if msg.note in pressed_notes:
+        if msg.type in (tmidi.NOTE_ON, tmidi.NOTE_OFF):
+            was_pressed = tracker.velocity(msg.note, msg.channel)
+            tracker.update(msg)
+            if tracker.velocity(msg.note, msg.channel):
+                print("note on", msg)
+            elif was_pressed:
                 midi.send(msg)  # send the note off
-                pressed_notes.remove(msg.note)
                 note_i = 0
+            pressed_notes = list(tracker.held_notes())
 
-    # do midi output
+    # send any arpeggiated notes that are due
+    scheduler.service()
+
+    # queue up the next arpeggiated note
     if len(pressed_notes) == 0:
+        next_note_time = 0
         continue
 
-    now = time.monotonic()
-    if now - last_note_time >= note_time:
-        last_note_time = now
-        note_on = tmidi.Message(tmidi.NOTE_ON, pressed_notes[note_i], 127)
-        print("arp note_on: ", note_on)
-        midi.send(note_on)
-        gate_time = note_time * gate_percent
-
-    if gate_time > 0 and now - last_note_time >= gate_time:
-        gate_time = 0
-        note_off = tmidi.Message(tmidi.NOTE_OFF, pressed_notes[note_i], 127)
-        print("arp note_off:", note_off)
-        midi.send(note_off)
+    now = time.monotonic_ns()
+    if next_note_time == 0:
+        next_note_time = now
+    if now >= next_note_time - note_time_ns:
+        notenum = pressed_notes[note_i % len(pressed_notes)]
+        note_on = tmidi.Message(tmidi.NOTE_ON, notenum, 127)
+        note_off = tmidi.Message(tmidi.NOTE_OFF, notenum, 127)
+        print("arp note:", notenum, "late by:", scheduler.lateness_ns // 1000, "us")
+        scheduler.schedule(note_on, next_note_time)
+        scheduler.schedule(note_off, next_note_time + gate_time_ns)
+        next_note_time += note_time_ns
         note_i = (note_i + 1) % len(pressed_notes)
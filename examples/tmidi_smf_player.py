@@ -0,0 +1,29 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+
+# This example shows how to loop a backing track from a MIDI file
+# on the CIRCUITPY drive out to USB MIDI, reading it from flash as it plays.
+# Press the BOOT button to step the tempo up by 10%.
+
+import board
+import keypad
+import usb_midi
+
+import tmidi
+import tmidi_smf
+
+midi_usb = tmidi.MIDI(midi_out=usb_midi.ports[1])
+keys = keypad.Keys((board.BUTTON,), value_when_pressed=False)
+
+with open("/backing.mid", "rb") as file:
+    player = tmidi_smf.Player(tmidi_smf.Reader(file), midi_usb)
+    print("length:", player.tick_to_us(player.length_ticks) // 1000, "msec")
+    player.set_loop(0, player.bar_to_tick(8))
+    player.play()
+    while player.playing:
+        player.service()
+        if key := keys.events.get():
+            if key.pressed:
+                player.speed = player.speed * 1.1
+                print("speed:", player.speed)
@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+# Allocation budgets for the receive and send hot paths. On a microcontroller,
+# allocations here are what lead to GC pauses, so a change that makes one of
+# these tests fail has added allocations to a hot path.
+#
+# Allocations are measured with gc.mem_free() deltas where it exists
+# (CircuitPython, MicroPython) and tracemalloc on CPython. CPython boxes ints
+# above 256, so every increment of a larger counter allocates there, which
+# MicroPython doesn't do. The MIDI.stats counters are reset between calls
+# on CPython to keep them small.
+
+import gc
+import io
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import tmidi
+import tmidi_router
+
+# bytes allocated per message allowed, in steady state
+RECEIVE_BUDGET = 8
+FORWARD_BUDGET = 16  # the router slices its buffer to read after a partial message
+SEND_BUDGET = 4
+
+NOTES = bytes((0x90, 60, 100, 0x80, 60, 0, 0xB0, 1, 64)) * 16
+
+
+class LoopPortStub:
+    """Port replaying data over and over, without allocating"""
+
+    def __init__(self, data):
+        self.file = io.BytesIO(data * max(1, 4096 // len(data)))
+
+    def readinto(self, buf, nbytes=None):  # pylint: disable=unused-argument
+        count = self.file.readinto(buf)
+        if not count:
+            self.file.seek(0)
+            count = self.file.readinto(buf)
+        return count
+
+    def write(self, buf, nbytes=None):  # pylint: disable=unused-argument
+        return nbytes
+
+
+def alloc_per_call(call, stats=None, calls=300):
+    """Average bytes call() allocates, after warming up"""
+    for _ in range(50):
+        call()
+    if hasattr(gc, "mem_free"):
+        # with the GC off, every allocation comes out of mem_free()
+        gc.collect()
+        gc.disable()
+        try:
+            free = gc.mem_free()
+            for _ in range(calls):
+                call()
+            used = free - gc.mem_free()
+        finally:
+            gc.enable()
+        return used / calls
+    # peak bytes allocated during each call, over what was allocated before it
+    tracemalloc.start()
+    used = 0
+    try:
+        for _ in range(calls):
+            if stats:
+                stats.reset()
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            used += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return used / calls
+
+
+def test_alloc_measures_message_allocation():
+    # receive() without a pool makes a Message each time, which must show up
+    midi = tmidi.MIDI(midi_in=LoopPortStub(NOTES))
+
+    assert alloc_per_call(midi.receive) > RECEIVE_BUDGET
+
+
+def test_alloc_receive_pooled():
+    midi = tmidi.MIDI(midi_in=LoopPortStub(NOTES), pool_size=4)
+
+    assert alloc_per_call(midi.receive, midi.stats) <= RECEIVE_BUDGET
+
+
+def test_alloc_receive_running_status():
+    data = bytes((0x90,)) + bytes((60, 100, 60, 0)) * 64
+    midi = tmidi.MIDI(
+        midi_in=LoopPortStub(data), pool_size=4, enable_running_status=True
+    )
+
+    assert alloc_per_call(midi.receive, midi.stats) <= RECEIVE_BUDGET
+
+
+def test_alloc_receive_into():
+    midi = tmidi.MIDI(midi_in=LoopPortStub(NOTES))
+    msg = tmidi.Message()
+    used = alloc_per_call(lambda: midi.receive_into(msg), midi.stats)
+
+    assert used <= RECEIVE_BUDGET
+
+
+def test_alloc_receive_filtered():
+    # two of every three messages are ignored, and cost nothing either
+    midi = tmidi.MIDI(
+        midi_in=LoopPortStub(NOTES),
+        pool_size=4,
+        ignore=(tmidi.NOTE_OFF, tmidi.CC),
+    )
+
+    assert alloc_per_call(midi.receive, midi.stats) <= RECEIVE_BUDGET
+
+
+def test_alloc_poll():
+    midi = tmidi.MIDI(midi_in=LoopPortStub(NOTES))
+    midi.on(tmidi.NOTE_ON, lambda channel, note, velocity: None)
+    midi.on(tmidi.CC, lambda channel, control, value: None, number=1)
+
+    assert alloc_per_call(lambda: midi.poll(1), midi.stats) <= RECEIVE_BUDGET
+
+
+def test_alloc_router_forward():
+    router = tmidi_router.Router()
+    router.add_route(LoopPortStub(NOTES), LoopPortStub(b"\0"), channel_map={0: 9})
+    msgs_per_read = 64 / 3
+
+    assert alloc_per_call(router.service) / msgs_per_read <= FORWARD_BUDGET
+
+
+def test_alloc_send():
+    midi = tmidi.MIDI(midi_out=LoopPortStub(b"\0"))
+    msg = tmidi.Message(tmidi.NOTE_ON, 60, 100)
+
+    assert alloc_per_call(lambda: midi.send(msg)) <= SEND_BUDGET
+
+
+def test_alloc_send_many():
+    midi = tmidi.MIDI(midi_out=LoopPortStub(b"\0"), enable_running_status_out=True)
+    msgs = [tmidi.Message(tmidi.CC, 1, i, channel=i % 2) for i in range(16)]
+
+    assert alloc_per_call(lambda: midi.send_many(msgs)) / 16 <= SEND_BUDGET
+
+
+def test_alloc_encode_into():
+    msg = tmidi.Message(tmidi.PITCH_BEND, channel=3)
+    msg.pitch_bend = 1000
+    buf = bytearray(3)
+
+    assert alloc_per_call(lambda: msg.encode_into(buf)) <= SEND_BUDGET
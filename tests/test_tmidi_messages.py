@@ -9,9 +9,12 @@ class PortStub:
     def __init__(self, data):
         self.data = data
         self.expected = None
+        self.written = []
 
     def write(self, buf, nbytes):
-        assert self.expected == list(buf)
+        self.written.append(list(buf[:nbytes]))
+        if self.expected is not None:
+            assert self.expected == list(buf[:nbytes])
 
 
 def test_message_note_on():
@@ -24,6 +27,39 @@ def test_message_program_change():
     assert str(msg) == "Message(ProgramChange ch:11 120)"
 
 
+def test_message_pitch_bend():
+    msg = tmidi.Message(tmidi.PITCH_BEND, 8191, channel=2)
+    assert (msg.data0, msg.data1) == (0x7F, 0x7F)
+    assert str(msg) == "Message(PitchBend ch:2 8191)"
+    msg = tmidi.Message(tmidi.PITCH_BEND, -8192)
+    assert (msg.data0, msg.data1) == (0, 0)
+
+
+def test_message_slots():
+    msg = tmidi.Message(tmidi.CC, 1, 2)
+    assert not hasattr(msg, "__dict__")
+
+
+def test_status_info():
+    # pylint: disable=protected-access
+    info = tmidi._STATUS_INFO
+    assert len(info) == 256
+    assert info[0x45] == 0
+    assert info[0x93] == 2 | tmidi.CHANNEL_MSG
+    assert info[0xCF] == 1 | tmidi.CHANNEL_MSG
+    assert info[tmidi.SONG_POSITION] == 2
+    assert info[tmidi.SYSEX] == 0
+    assert info[tmidi.CLOCK] == tmidi.REALTIME_MSG
+
+
+def test_message_system_str():
+    assert (
+        str(tmidi.Message(tmidi.SONG_POSITION, 1, 2)) == "Message(SongPosition - 1 2)"
+    )
+    assert str(tmidi.Message(tmidi.STOP)) == "Message(Stop)"
+    assert str(tmidi.Message(0xF4)) == "Message(Unknown)"
+
+
 def test_message_note_on_send():
     port = PortStub(iter([]))
     midi_out = tmidi.MIDI(midi_out=port)
@@ -44,3 +80,104 @@ def test_message_program_change_send():
     msg = tmidi.Message(tmidi.PROGRAM_CHANGE, 33)
     port.expected = [0xC0, 33]
     midi_out.send(msg)
+
+
+def test_message_encode_into():
+    buf = bytearray(5)
+    assert tmidi.Message(tmidi.CC, 74, 63, channel=4).encode_into(buf, 2) == 3
+    assert list(buf) == [0, 0, 0xB4, 74, 63]
+    assert tmidi.Message(tmidi.CLOCK).encode_into(buf) == 1
+    assert buf[0] == 0xF8
+
+
+def test_send_many():
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(midi_out=port)
+
+    chord = [tmidi.Message(tmidi.NOTE_ON, n, 100) for n in (60, 64, 67)]
+    midi_out.send_many(chord, channel=1)
+    assert port.written == [[0x91, 60, 100, 0x91, 64, 100, 0x91, 67, 100]]
+
+
+def test_send_many_split():
+    # Batches larger than the output buffer are written in buffer-sized pieces
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(midi_out=port, out_buf_size=6)
+
+    midi_out.send([tmidi.Message(tmidi.PROGRAM_CHANGE, n) for n in range(5)])
+    assert port.written == [[0xC0, 0, 0xC0, 1, 0xC0, 2], [0xC0, 3, 0xC0, 4]]
+
+
+def test_send_running_status_out():
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(midi_out=port, enable_running_status_out=True)
+
+    midi_out.send(
+        [
+            tmidi.Message(tmidi.NOTE_ON, 60, 100),
+            tmidi.Message(tmidi.NOTE_ON, 64, 100),
+            tmidi.Message(tmidi.CLOCK),
+            tmidi.Message(tmidi.NOTE_OFF, 60, 64),
+            tmidi.Message(tmidi.NOTE_OFF, 64, 64, channel=1),
+            tmidi.Message(tmidi.SONG_SELECT, 3),
+            tmidi.Message(tmidi.NOTE_OFF, 64, 64, channel=1),
+        ]
+    )
+    assert port.written == [
+        [0x90, 60, 100, 64, 100, 0xF8, 60, 0, 0x81, 64, 64, 0xF3, 3, 0x81, 64, 64]
+    ]
+
+
+def test_send_running_status_refresh():
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(
+        midi_out=port, enable_running_status_out=True, running_status_refresh=2
+    )
+
+    msg = tmidi.Message(tmidi.CC, 1, 0)
+    for val in range(5):
+        msg.data1 = val
+        midi_out.send(msg)
+    assert port.written == [[0xB0, 1, 0], [1, 1], [0xB0, 1, 2], [1, 3], [0xB0, 1, 4]]
+
+
+def test_send_sysex():
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(midi_out=port)
+
+    payload = bytearray([0x7D, 1, 2, 3])
+    midi_out.send_sysex(payload)
+    midi_out.send_sysex(memoryview(payload)[:2], end=False)
+    midi_out.send_sysex(memoryview(payload)[2:], start=False)
+    assert port.written == [
+        [0xF0],
+        [0x7D, 1, 2, 3],
+        [0xF7],
+        [0xF0],
+        [0x7D, 1],
+        [2, 3],
+        [0xF7],
+    ]
+
+
+def test_send_timestamps(monkeypatch):
+    monkeypatch.setattr(tmidi.time, "monotonic_ns", lambda: 1234)
+    port = PortStub(iter([]))
+    midi_out = tmidi.MIDI(midi_out=port, timestamps=True)
+
+    assert midi_out.send_time_ns == 0
+    midi_out.send(tmidi.Message(tmidi.NOTE_ON, 64, 123))
+    assert midi_out.send_time_ns == 1234
+
+
+def test_latency_histogram():
+    latency = tmidi.LatencyHistogram(num_buckets=8)
+    for usec in (0, 1, 3, 3, 100, 100_000):
+        latency.add(usec * 1000 + 500)
+    assert latency.count == 6
+    assert latency.buckets == [1, 1, 2, 0, 0, 0, 0, 2]
+    assert latency.percentile(50) == 4000
+    assert latency.percentile(100) == 100_000_500
+    assert latency.max_ns == 100_000_500
+    latency.reset()
+    assert latency.count == 0 and latency.buckets == [0] * 8
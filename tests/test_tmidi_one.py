@@ -3,12 +3,15 @@
 # SPDX-License-Identifier: MIT
 
 
+import asyncio
+
 import tmidi
 
 
 class PortStub:
     def __init__(self, data):
         self.data = data
+        self.reads = 0
 
     def read(self, numbytes=None):
         if numbytes is None:
@@ -17,7 +20,10 @@ class PortStub:
         self.readinto(buf, numbytes)
         return buf
 
-    def readinto(self, buf, numbytes=1):
+    def readinto(self, buf, numbytes=None):
+        if numbytes is None:
+            numbytes = len(buf)
+        self.reads += 1
         bytes_read = 0
         for n in range(numbytes):
             try:
@@ -62,3 +68,388 @@ def test_midi_in_invalid_data():
 
     assert msg is None
     assert midi_in.error_count == 1
+
+
+def test_midi_in_buffered_reads():
+    # Three NoteOns and a CC arrive in a single port read
+    port = PortStub(iter([0x90, 60, 100, 0x90, 64, 100, 0x91, 67, 90, 0xB0, 74, 63]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    msgs = [midi_in.receive() for _ in range(4)]
+
+    assert port.reads == 1
+    assert [str(m) for m in msgs] == [
+        "Message(NoteOn ch:0 60 100)",
+        "Message(NoteOn ch:0 64 100)",
+        "Message(NoteOn ch:1 67 90)",
+        "Message(CC ch:0 74 63)",
+    ]
+    assert midi_in.receive() is None
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_small_buffer():
+    # Messages spanning buffer refills are still parsed whole
+    port = PortStub(iter([0x90, 60, 100, 0xC3, 5]))
+    midi_in = tmidi.MIDI(midi_in=port, in_buf_size=2)
+
+    assert str(midi_in.receive()) == "Message(NoteOn ch:0 60 100)"
+    assert str(midi_in.receive()) == "Message(ProgramChange ch:3 5)"
+    assert midi_in.receive() is None
+
+
+def test_midi_in_running_status():
+    port = PortStub(iter([0x90, 60, 100, 62, 101]))
+    midi_in = tmidi.MIDI(midi_in=port, enable_running_status=True)
+
+    assert str(midi_in.receive()) == "Message(NoteOn ch:0 60 100)"
+    assert str(midi_in.receive()) == "Message(NoteOn ch:0 62 101)"
+    assert midi_in.receive() is None
+
+
+def test_midi_in_partial_message():
+    # A NoteOn split across port reads does not block and is finished later
+    data = [0x90, 60]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    assert midi_in.receive() is None
+
+    port.data = iter([100, 0xE0, 0, 0x40])
+    assert str(midi_in.receive()) == "Message(NoteOn ch:0 60 100)"
+    assert str(midi_in.receive()) == "Message(PitchBend ch:0 0)"
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_status_in_data():
+    # A NoteOn cut short by another status byte is dropped and counted
+    port = PortStub(iter([0x90, 60, 0xC0, 7]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    assert str(midi_in.receive()) == "Message(ProgramChange ch:0 7)"
+    assert midi_in.error_count == 1
+
+
+def test_midi_in_receive_into():
+    port = PortStub(iter([0x92, 60, 100, 0xF8]))
+    midi_in = tmidi.MIDI(midi_in=port)
+    msg = tmidi.Message()
+
+    assert midi_in.receive_into(msg) is msg
+    assert str(msg) == "Message(NoteOn ch:2 60 100)"
+    assert midi_in.receive_into(msg) is msg
+    assert str(msg) == "Message(Clock)"
+    assert midi_in.receive_into(msg) is None
+    assert str(msg) == "Message(Clock)"
+
+
+def test_midi_in_pool():
+    port = PortStub(iter([0xC0, 1, 0xC0, 2, 0xC0, 3]))
+    midi_in = tmidi.MIDI(midi_in=port, pool_size=2)
+
+    msg1 = midi_in.receive()
+    assert msg1.value == 1
+    msg2 = midi_in.receive()
+    assert msg2.value == 2 and msg2 is not msg1
+    msg3 = midi_in.receive()
+    assert msg3 is msg1 and msg3.value == 3
+    assert midi_in.receive() is None
+
+
+def test_midi_in_receive_many():
+    data = []
+    for cc in range(20):
+        data += [0xB0, cc, 64]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    msgs = midi_in.receive_many(16)
+    assert [m.data0 for m in msgs] == list(range(16))
+    msgs = midi_in.receive_many(16)
+    assert [m.data0 for m in msgs] == list(range(16, 20))
+    assert midi_in.receive_many() == []
+
+
+def test_midi_in_pending():
+    port = PortStub(iter([0xFA, 0x90, 60, 100, 0xFC]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    types = [msg.type for msg in midi_in.pending()]
+    assert types == [tmidi.START, tmidi.NOTE_ON, tmidi.STOP]
+
+
+def test_midi_in_sysex_chunks():
+    payload = list(range(10))
+    port = PortStub(iter([0xF0] + payload + [0xF7, 0xC0, 5]))
+    midi_in = tmidi.MIDI(midi_in=port, sysex_buf=bytearray(4))
+
+    chunks = []
+    while True:
+        msg = midi_in.receive()
+        assert msg.type == tmidi.SYSEX
+        chunks.append(bytes(midi_in.sysex_data))
+        if midi_in.sysex_complete:
+            break
+    assert chunks == [bytes([0, 1, 2, 3]), bytes([4, 5, 6, 7]), bytes([8, 9])]
+    assert str(midi_in.receive()) == "Message(ProgramChange ch:0 5)"
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_sysex_ended_by_status():
+    port = PortStub(iter([0xF0, 1, 2, 0x90, 60, 100]))
+    midi_in = tmidi.MIDI(midi_in=port, sysex_buf=bytearray(16))
+
+    assert midi_in.receive().type == tmidi.SYSEX
+    assert bytes(midi_in.sysex_data) == bytes([1, 2])
+    assert midi_in.sysex_complete
+    assert str(midi_in.receive()) == "Message(NoteOn ch:0 60 100)"
+
+
+def test_midi_in_sysex_overflow():
+    data = [0xF0, 1, 2, 3, 4, 5, 0xF7, 0xF0, 1, 2, 3, 4, 5, 0xF7, 0xFC]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(midi_in=port, sysex_buf=bytearray(16), sysex_max=3)
+
+    # dropped
+    assert midi_in.receive().type == tmidi.STOP
+    assert midi_in.error_count == 2
+
+    port.data = iter(data)
+    midi_in = tmidi.MIDI(
+        midi_in=port, sysex_buf=bytearray(16), sysex_max=3, sysex_truncate=True
+    )
+    assert midi_in.receive().type == tmidi.SYSEX
+    assert bytes(midi_in.sysex_data) == bytes([1, 2, 3])
+    assert midi_in.sysex_complete
+    assert midi_in.receive().type == tmidi.SYSEX
+    assert midi_in.receive().type == tmidi.STOP
+
+
+def test_midi_in_sysex_no_buffer():
+    port = PortStub(iter([0xF0, 1, 2, 3, 0xF7, 0xFA]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    assert midi_in.receive().type == tmidi.SYSEX
+    assert len(midi_in.sysex_data) == 0
+    assert midi_in.receive().type == tmidi.START
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_interleaved_realtime():
+    port = PortStub(iter([0x90, 0xF8, 60, 0xF8, 100, 0xB0, 1, 0xFE, 2]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    msgs = [str(msg) for msg in midi_in.pending()]
+    assert msgs == [
+        "Message(Clock)",
+        "Message(Clock)",
+        "Message(NoteOn ch:0 60 100)",
+        "Message(ActiveSensing)",
+        "Message(CC ch:0 1 2)",
+    ]
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_realtime_in_sysex():
+    port = PortStub(iter([0xF0, 1, 0xF8, 2, 0xF7]))
+    midi_in = tmidi.MIDI(midi_in=port, sysex_buf=bytearray(8))
+
+    assert midi_in.receive().type == tmidi.CLOCK
+    assert midi_in.receive().type == tmidi.SYSEX
+    assert bytes(midi_in.sysex_data) == bytes([1, 2])
+
+
+def test_midi_in_filter():
+    data = [0xFE, 0x90, 60, 100, 0xF8, 0x91, 61, 100, 0xD0, 5, 0xB0, 1, 2]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(
+        midi_in=port,
+        ignore=(tmidi.ACTIVE_SENSING, tmidi.CHANNEL_PRESSURE),
+        channel_mask=0b1,
+    )
+
+    msgs = [str(msg) for msg in midi_in.pending()]
+    assert msgs == [
+        "Message(NoteOn ch:0 60 100)",
+        "Message(Clock)",
+        "Message(CC ch:0 1 2)",
+    ]
+    assert midi_in.error_count == 0
+
+
+def test_midi_in_filter_running_status_and_sysex():
+    data = [0xF0, 1, 2, 0xF7, 0x90, 60, 100, 61, 100, 0xF8]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(
+        midi_in=port,
+        enable_running_status=True,
+        sysex_buf=bytearray(8),
+        ignore=(tmidi.SYSEX, tmidi.NOTE_ON),
+    )
+
+    assert midi_in.receive().type == tmidi.CLOCK
+    assert midi_in.error_count == 0
+
+    midi_in.set_filter()
+    port.data = iter(data)
+    assert midi_in.receive().type == tmidi.SYSEX
+
+
+def test_midi_in_poll_handlers():
+    data = [0x90, 60, 100, 0xB1, 1, 64, 0xB1, 7, 100, 0xF8, 0xB2, 1, 5, 0xC0, 3]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(midi_in=port)
+    calls = []
+
+    midi_in.on(tmidi.NOTE_ON, lambda *args: calls.append(("on",) + args))
+    midi_in.on(tmidi.CC, lambda *args: calls.append(("cc",) + args), channel=1)
+    midi_in.on(tmidi.CC, lambda *args: calls.append(("mod",) + args), number=1)
+    midi_in.on(tmidi.CLOCK, lambda *args: calls.append(("clock",) + args))
+
+    assert midi_in.poll() == 6
+    assert calls == [
+        ("on", 0, 60, 100),
+        ("mod", 1, 1, 64),
+        ("cc", 1, 7, 100),
+        ("clock", 0, 0, 0),
+        ("mod", 2, 1, 5),
+    ]
+    assert midi_in.poll() == 0
+
+    midi_in.on(tmidi.NOTE_ON, None)
+    port.data = iter([0x90, 60, 100])
+    calls.clear()
+    assert midi_in.poll() == 1
+    assert not calls
+
+
+def test_midi_in_receive_async():
+    port = PortStub(iter([]))
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    async def feed():
+        await asyncio.sleep(0.01)
+        port.data = iter([0x90, 60, 100, 0xFC])
+
+    async def main():
+        asyncio.create_task(feed())
+        msg = await midi_in.receive_async()
+        async for msg2 in midi_in:
+            return msg, msg2
+
+    msg, msg2 = asyncio.run(main())
+    assert str(msg) == "Message(NoteOn ch:0 60 100)"
+    assert msg2.type == tmidi.STOP
+
+
+def test_merge_is_fair():
+    port1 = PortStub(iter([0xC0, 1, 0xC0, 2, 0xC0, 3]))
+    port2 = PortStub(iter([0xC1, 1, 0xC1, 2]))
+    midi1 = tmidi.MIDI(midi_in=port1)
+    midi2 = tmidi.MIDI(midi_in=port2)
+
+    async def main():
+        received = []
+        async for midi_in, msg in tmidi.Merge(midi1, midi2):
+            received.append((midi_in is midi1, msg.value))
+            if len(received) == 5:
+                return received
+
+    received = asyncio.run(main())
+    assert received == [(True, 1), (False, 1), (True, 2), (False, 2), (True, 3)]
+
+
+def test_midi_in_timestamps(monkeypatch):
+    times = iter([1000, 2000])
+    monkeypatch.setattr(tmidi.time, "monotonic_ns", lambda: next(times))
+    port = PortStub(iter([0x90, 60]))
+    midi_in = tmidi.MIDI(midi_in=port, timestamps=True)
+
+    assert midi_in.receive() is None
+    port.data = iter([0xF8, 100, 0xC0, 1])
+    clock = midi_in.receive()
+    assert clock.type == tmidi.CLOCK and clock.time == 2000
+    note_on = midi_in.receive()
+    assert note_on.type == tmidi.NOTE_ON and note_on.time == 1000
+    program_change = midi_in.receive()
+    assert program_change.time == 2000
+    assert midi_in.receive_time_ns == 2000
+
+
+def test_midi_in_no_timestamps():
+    port = PortStub(iter([0x90, 60, 100]))
+    midi_in = tmidi.MIDI(midi_in=port)
+    assert midi_in.receive().time == 0
+
+
+class UARTStub:
+    """Port with in_waiting, whose readinto() blocks when asked for more"""
+
+    def __init__(self):
+        self.waiting = b""
+        self.reads = 0
+
+    def arrive(self, data):
+        self.waiting += bytes(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.waiting)
+
+    def readinto(self, buf):
+        # one argument, like io.RawIOBase and pySerial
+        nbytes = len(buf)
+        if nbytes > len(self.waiting):
+            raise AssertionError("readinto() would wait for the timeout")
+        buf[:nbytes] = self.waiting[:nbytes]
+        self.waiting = self.waiting[nbytes:]
+        self.reads += 1
+        return nbytes
+
+
+def test_midi_in_reads_only_waiting_bytes():
+    port = UARTStub()
+    midi_in = tmidi.MIDI(midi_in=port)
+
+    port.arrive([0x90, 60])
+    assert midi_in.receive() is None
+    assert midi_in.receive() is None  # nothing waiting, so no read
+    assert port.reads == 1
+    port.arrive([100, 0xB0, 1, 2])
+    assert bytes(midi_in.receive()) == bytes((0x90, 60, 100))
+    assert bytes(midi_in.receive()) == bytes((0xB0, 1, 2))
+    assert port.reads == 2
+    assert midi_in.stats.buffer_overruns == 0
+    port.arrive([0xF8] * 70)  # more than the buffer, read a buffer at a time
+    assert len(list(midi_in.pending())) == 70
+    assert port.reads == 4
+
+
+def test_midi_in_stats():
+    data = [5, 0x90, 60, 0xB0, 1, 2, 0xFE, 0xF0, 1, 2, 3, 0xF7, 0x90, 61, 100]
+    port = PortStub(iter(data))
+    midi_in = tmidi.MIDI(
+        midi_in=port, in_buf_size=8, sysex_max=2, ignore=(tmidi.ACTIVE_SENSING,)
+    )
+    midi_in.stats.timing = True
+
+    msgs = list(midi_in.pending())
+    assert len(msgs) == 2
+
+    stats = midi_in.stats
+    assert stats.bytes_read == len(data)
+    assert stats.port_reads == 3
+    assert stats.buffer_overruns == 1
+    assert stats.filtered == 1
+    assert stats.orphan_data == 1
+    assert stats.status_in_data == 1
+    assert stats.sysex_overflow == 1
+    assert stats.errors == 3 == midi_in.error_count
+    assert stats.message_count(tmidi.CC) == 1
+    assert stats.message_count(tmidi.NOTE_ON) == 1
+    assert stats.message_count(tmidi.ACTIVE_SENSING) == 0
+    assert stats.max_receive_ns > 0
+
+    stats.reset()
+    assert stats.bytes_read == 0 and stats.errors == 0
+    assert stats.message_count(tmidi.CC) == 0
@@ -0,0 +1,180 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+
+import tmidi
+import tmidi_router
+
+
+class InPortStub:
+    def __init__(self, *reads):
+        self.reads = list(reads)
+
+    def readinto(self, buf):
+        if not self.reads:
+            return 0
+        data = self.reads.pop(0)
+        buf[: len(data)] = bytes(data)
+        return len(data)
+
+
+class UARTStub:
+    """Port with in_waiting, whose readinto() blocks when asked for more"""
+
+    def __init__(self, data):
+        self.waiting = bytes(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.waiting)
+
+    def readinto(self, buf):
+        nbytes = len(buf)
+        if nbytes > len(self.waiting):
+            raise AssertionError("readinto() would wait for the timeout")
+        buf[:nbytes] = self.waiting[:nbytes]
+        self.waiting = self.waiting[nbytes:]
+        return nbytes
+
+
+class OutPortStub:
+    def __init__(self):
+        self.written = []
+
+    def write(self, buf, nbytes):
+        self.written.append(bytes(buf[:nbytes]))
+
+    @property
+    def data(self):
+        return list(b"".join(self.written))
+
+
+def test_router_thru():
+    data = [0x90, 60, 100, 0xB0, 1, 2, 0xF8, 0xC3, 7]
+    port_in = InPortStub(data)
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in, port_out)
+
+    assert router.service() == len(data)
+    assert port_out.written == [bytes(data)]
+    assert router.service() == 0
+
+
+def test_router_partial_and_realtime():
+    port_in = InPortStub([0x90, 60], [0xF8, 100, 0x91], [62, 0xFE, 1])
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in, port_out)
+
+    router.service()
+    assert port_out.data == []
+    router.service()
+    assert port_out.data == [0xF8, 0x90, 60, 100]
+    router.service()
+    assert port_out.data == [0xF8, 0x90, 60, 100, 0xFE, 0x91, 62, 1]
+
+
+def test_router_filter_and_remap():
+    data = [0xFE, 0x90, 60, 100, 0x91, 61, 100, 0xB0, 1, 2, 0xD0, 5]
+    port_in = InPortStub(data)
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(
+        port_in,
+        port_out,
+        ignore=(tmidi.ACTIVE_SENSING, tmidi.CHANNEL_PRESSURE),
+        channel_mask=0b1,
+        channel_map={0: 9},
+    )
+
+    router.service()
+    assert port_out.data == [0x99, 60, 100, 0xB9, 1, 2]
+
+
+def test_router_fan_out_remap():
+    data = [0x90, 60, 100, 0xB0, 1, 2]
+    port_in = InPortStub(data)
+    port_out1 = OutPortStub()
+    port_out2 = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in, port_out1, channel_map={0: 3})
+    router.add_route(port_in, port_out2)
+
+    router.service()
+    assert port_out1.data == [0x93, 60, 100, 0xB3, 1, 2]
+    assert port_out2.data == data
+
+
+def test_router_merge_running_status():
+    port_in1 = InPortStub([0x90, 60, 100, 62, 100])
+    port_in2 = InPortStub([0x91, 1, 2])
+    port_in1.reads.append([64, 100])
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in1, port_out)
+    router.add_route(port_in2, port_out)
+
+    router.service()
+    router.service()
+    assert port_out.data == [0x90, 60, 100, 62, 100, 0x91, 1, 2, 0x90, 64, 100]
+
+
+def test_router_merge_during_sysex():
+    port_in1 = InPortStub([0xF0, 1, 2], [3, 0xF7])
+    port_in2 = InPortStub([0xF8, 0x90, 60, 100, 0x91, 62], [100])
+    port_in3 = InPortStub([0xB0, 1, 2])
+    port_out = OutPortStub()
+    other_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in1, port_out)
+    router.add_route(port_in2, port_out)
+    router.add_route(port_in2, other_out)
+    router.add_route(port_in3, other_out)
+
+    router.service()
+    # the notes wait for the SysEx to end, real-time messages don't
+    assert port_out.data == [0xF0, 1, 2, 0xF8]
+    assert other_out.data == [0xF8, 0xB0, 1, 2]
+    router.service()
+    assert port_out.data == [0xF0, 1, 2, 0xF8, 3, 0xF7, 0x90, 60, 100, 0x91, 62, 100]
+    assert other_out.data == [0xF8, 0xB0, 1, 2, 0x90, 60, 100, 0x91, 62, 100]
+    assert router.service() == 0
+
+
+def test_router_reads_only_waiting_bytes():
+    port_in = UARTStub([0x90, 60, 100, 0x91] + [0xF8] * 80)
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in, port_out)
+
+    assert router.service() == 64
+    assert router.service() == 20
+    assert router.service() == 0  # nothing waiting, so no read
+    port_in.waiting = bytes((62, 100))
+    assert router.service() == 2
+    assert port_out.data == [0x90, 60, 100] + [0xF8] * 80 + [0x91, 62, 100]
+
+
+def test_router_sysex_and_errors():
+    port_in = InPortStub([5, 0xF0, 1, 2], [3, 0xF7, 0x90, 60, 0xC0, 1])
+    port_out = OutPortStub()
+    router = tmidi_router.Router()
+    router.add_route(port_in, port_out)
+
+    router.service()
+    router.service()
+    assert port_out.data == [0xF0, 1, 2, 3, 0xF7, 0xC0, 1]
+    assert router.error_count == 2
+
+
+def test_router_histogram():
+    latency = tmidi.LatencyHistogram()
+    port_in = InPortStub([0x90, 60, 100], [0xF8])
+    router = tmidi_router.Router(histogram=latency)
+    router.add_route(port_in, OutPortStub())
+
+    router.service()
+    router.service()
+    router.service()
+    assert latency.count == 2
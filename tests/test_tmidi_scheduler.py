@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+
+import importlib.util
+import random
+import sys
+
+import tmidi
+import tmidi_scheduler
+
+
+class PortStub:
+    def __init__(self):
+        self.written = []
+
+    def write(self, buf, nbytes):
+        self.written.append(list(buf[:nbytes]))
+
+
+def test_scheduler_service():
+    port = PortStub()
+    scheduler = tmidi_scheduler.Scheduler(tmidi.MIDI(midi_out=port))
+    scheduler.schedule(tmidi.Message(tmidi.NOTE_OFF, 60, 0), 2000)
+    scheduler.schedule(tmidi.Message(tmidi.NOTE_ON, 60, 100), 1000)
+    scheduler.schedule(tmidi.Message(tmidi.NOTE_ON, 64, 100), 1000)
+    scheduler.schedule(tmidi.Message(tmidi.NOTE_ON, 67, 100), 1500)
+    assert scheduler.pending == 4
+
+    assert scheduler.service(now_ns=999) == 0
+    assert scheduler.service(now_ns=1600) == 3
+    assert port.written == [[0x90, 60, 100, 0x90, 64, 100, 0x90, 67, 100]]
+    assert scheduler.lateness_ns == 600
+    assert scheduler.service(now_ns=2000) == 1
+    assert port.written[1] == [0x80, 60, 0]
+    assert scheduler.lateness_ns == 0
+    assert scheduler.max_lateness_ns == 600
+    assert scheduler.pending == 0
+
+
+def test_scheduler_schedule_in():
+    port = PortStub()
+    scheduler = tmidi_scheduler.Scheduler(tmidi.MIDI(midi_out=port))
+    scheduler.schedule_in(tmidi.Message(tmidi.CLOCK), 0)
+    scheduler.schedule_in(tmidi.Message(tmidi.STOP), 10_000_000_000)
+    assert scheduler.service() == 1
+    scheduler.clear()
+    assert scheduler.pending == 0
+
+
+def test_scheduler_fallback_heap(monkeypatch):
+    # a separate copy of tmidi, made without heapq
+    monkeypatch.setitem(sys.modules, "heapq", None)
+    spec = importlib.util.spec_from_file_location("tmidi_no_heapq", tmidi.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.undo()
+
+    assert module._heappush is not tmidi._heappush
+    heap = []
+    values = [random.randrange(1000) for _ in range(200)]
+    for value in values:
+        module._heappush(heap, value)
+    assert [module._heappop(heap) for _ in values] == sorted(values)
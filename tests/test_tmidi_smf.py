@@ -0,0 +1,375 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+import io
+import tracemalloc
+
+import pytest
+
+import tmidi
+import tmidi_smf
+
+
+def smf(*tracks, fmt=None, division=96):
+    """Bytes of a Standard MIDI File holding track chunks of the given bytes"""
+    if fmt is None:
+        fmt = 0 if len(tracks) == 1 else 1
+    data = b"MThd" + (6).to_bytes(4, "big")
+    data += fmt.to_bytes(2, "big") + len(tracks).to_bytes(2, "big")
+    data += division.to_bytes(2, "big")
+    for track in tracks:
+        data += b"MTrk" + len(track).to_bytes(4, "big") + bytes(track)
+    return data
+
+
+END = [0x00, 0xFF, 0x2F, 0x00]
+
+
+def test_smf_header():
+    reader = tmidi_smf.Reader(smf(END, END, division=480))
+
+    assert reader.format == 1
+    assert reader.num_tracks == 2
+    assert reader.division == 480
+
+
+def test_smf_not_a_midi_file():
+    with pytest.raises(ValueError):
+        tmidi_smf.Reader(b"RIFF\x00\x00\x00\x04WAVE")
+
+
+def test_smf_format_0_events():
+    track = [
+        0x00, 0xFF, 0x03, 0x04, *b"Lead",  # track name, skipped
+        0x00, 0x90, 60, 100,
+        0x60, 64, 100,  # running status
+        0x81, 0x00, 0x80, 60, 0,  # two byte delta time, 128 ticks
+        0x00, 0xF0, 0x03, 0x7E, 0x01, 0xF7,  # SysEx, skipped
+        0x10, 0xC2, 5,
+        0x00, 0xE1, 0x00, 0x40,
+    ] + END  # fmt: skip
+    reader = tmidi_smf.Reader(smf(track))
+
+    msgs = list(reader.events())
+
+    assert [(m.time, m.type, m.channel, m.data0, m.data1) for m in msgs] == [
+        (0, tmidi.NOTE_ON, 0, 60, 100),
+        (96, tmidi.NOTE_ON, 0, 64, 100),
+        (224, tmidi.NOTE_OFF, 0, 60, 0),
+        (240, tmidi.PROGRAM_CHANGE, 2, 5, 0),
+        (240, tmidi.PITCH_BEND, 1, 0x00, 0x40),
+    ]
+    assert msgs[-1].pitch_bend == 0
+    assert reader.error_count == 0
+
+
+def test_smf_format_1_merge():
+    track0 = [0x00, 0x90, 60, 100, 0x30, 0x80, 60, 0] + END
+    track1 = [0x10, 0x91, 64, 90, 0x10, 0x81, 64, 0] + END
+    track2 = [0x30, 0x92, 67, 80] + END
+    reader = tmidi_smf.Reader(smf(track0, track1, track2))
+
+    msgs = list(reader.events())
+
+    # events at the same tick stay in track order
+    assert [(m.time, m.channel, m.data0) for m in msgs] == [
+        (0, 0, 60),
+        (16, 1, 64),
+        (32, 1, 64),
+        (48, 0, 60),
+        (48, 2, 67),
+    ]
+    assert [m.data0 for m in reader.events(track=1)] == [64, 64]
+
+
+def test_smf_file_object_small_buffer():
+    track0 = [0x00, 0xFF, 0x51, 0x03, 0x07, 0xA1, 0x20] + END
+    track1 = []
+    for i in range(50):
+        track1 += [0x00, 0x90, i, 100, 0x81, 0x40, 0x80, i, 0]
+    data = smf(track0, track1 + END)
+
+    from_buffer = [bytes(m) for m in tmidi_smf.Reader(memoryview(data)).events()]
+    reader = tmidi_smf.Reader(io.BytesIO(data), buf_size=5)
+    from_file = [bytes(m) for m in reader.events()]
+
+    assert len(from_file) == 100
+    assert from_file == from_buffer
+
+
+def test_smf_meta_events():
+    track0 = [
+        0x00, 0xFF, 0x58, 0x04, 3, 2, 24, 8,
+        0x00, 0xFF, 0x51, 0x03, 0x07, 0xA1, 0x20,
+        0x83, 0x00, 0xFF, 0x51, 0x03, 0x0F, 0x42, 0x40,
+    ] + END  # fmt: skip
+    track1 = [0x00, 0x90, 60, 100] + END
+    reader = tmidi_smf.Reader(smf(track0, track1))
+
+    tempos = list(reader.meta_events((tmidi_smf.META_TEMPO,)))
+
+    assert tempos == [
+        (0, tmidi_smf.META_TEMPO, bytes((0x07, 0xA1, 0x20))),
+        (384, tmidi_smf.META_TEMPO, bytes((0x0F, 0x42, 0x40))),
+    ]
+    assert len(list(reader.events())) == 1
+
+
+def test_smf_truncated_track():
+    track = [0x00, 0x90, 60, 100, 0x10, 0x80, 60, 0] + END
+    data = smf(track)[:-6]  # cut off in the middle of the note off
+    reader = tmidi_smf.Reader(io.BytesIO(data))
+
+    msgs = list(reader.events())
+
+    assert len(msgs) == 1
+    assert reader.error_count == 1
+
+
+def test_smf_constant_memory():
+    track = [0x00, 0x90, 60, 100]
+    track += [0x01, 60, 100] * 20000  # running status
+    data = smf(track + END)
+    reader = tmidi_smf.Reader(io.BytesIO(data))
+    msg = tmidi.Message()
+
+    tracemalloc.start()
+    count = 0
+    for _ in reader.events(msg=msg):
+        count += 1
+        if count == 100:
+            tracemalloc.reset_peak()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert count == 20001
+    assert peak < 4096  # the file is 60k
+
+
+class OutPortStub:
+    def __init__(self):
+        self.written = []
+
+    def write(self, buf, nbytes):
+        self.written.append(bytes(buf[:nbytes]))
+
+    def take(self):
+        data = list(b"".join(self.written))
+        self.written.clear()
+        return data
+
+
+MS = 1_000_000  # nanoseconds
+
+
+def player_for(*tracks, **kwargs):
+    port = OutPortStub()
+    midi = tmidi.MIDI(midi_out=port)
+    player = tmidi_smf.Player(tmidi_smf.Reader(smf(*tracks)), midi, **kwargs)
+    return player, port
+
+
+def test_player_tempo_map():
+    track0 = [
+        0x00, 0xFF, 0x58, 0x04, 4, 2, 24, 8,  # 4/4
+        0x83, 0x00, 0xFF, 0x51, 0x03, 0x03, 0xD0, 0x90,  # 250000 usec/beat at 384
+        0x00, 0xFF, 0x58, 0x04, 3, 2, 24, 8,  # 3/4 at bar 1
+    ] + END  # fmt: skip
+    player, _ = player_for(track0, [0x00, 0x90, 60, 100] + END)
+
+    assert player.tick_to_us(96) == 500_000
+    assert player.tick_to_us(384) == 2_000_000
+    assert player.tick_to_us(480) == 2_250_000
+    assert player.us_to_tick(2_250_000) == 480
+    assert player.us_to_tick(1_000_000) == 192
+    assert player.bar_to_tick(1) == 384
+    assert player.bar_to_tick(3) == 384 + 2 * 288
+
+
+def test_player_smpte():
+    track = [0x00, 0x90, 60, 100, 0x87, 0x68, 0x80, 60, 0] + END  # off at 1000
+    port = OutPortStub()
+    # 25 frames per second, 40 ticks per frame
+    reader = tmidi_smf.Reader(smf(track, division=0xE728))
+    player = tmidi_smf.Player(reader, tmidi.MIDI(midi_out=port))
+
+    assert player.tick_to_us(1000) == 1_000_000
+    assert player.bar_to_tick(1) == 4000
+
+
+def test_player_long_file():
+    # a tempo change 3 hours in, past what 32 bit microseconds hold
+    ticks = 3 * 3600 * 2 * 96  # at 120 BPM
+    delta = [0x80 | ticks >> 14, 0x80 | ticks >> 7 & 0x7F, ticks & 0x7F]
+    track0 = [0x00, 0xFF, 0x51, 0x03, 0x07, 0xA1, 0x20]
+    track0 += delta + [0xFF, 0x51, 0x03, 0x0F, 0x42, 0x40]  # 60 BPM
+    player, _ = player_for(track0 + END, [0x00, 0x90, 60, 100] + END)
+
+    three_hours = 3 * 3600 * 1_000_000
+    assert player.tick_to_us(ticks + 96) == three_hours + 1_000_000
+    assert player.us_to_tick(three_hours + 1_000_000) == ticks + 96
+
+
+def test_player_service():
+    track = [0x00, 0x90, 60, 100, 0x00, 0x90, 64, 100, 0x60, 0x80, 60, 0] + END
+    player, port = player_for(track)
+
+    player.play(now_ns=0)
+
+    assert player.service(0) == 2
+    assert len(port.written) == 1  # the chord went out in one write
+    assert port.take() == [0x90, 60, 100, 0x90, 64, 100]
+    assert player.service(499 * MS) == 0
+    assert player.service(500 * MS) == 1
+    assert port.take() == [0x80, 60, 0]
+    assert not player.playing
+
+
+def test_player_speed():
+    track = [0x00, 0x90, 60, 100, 0x60, 0x80, 60, 0] + END
+    player, port = player_for(track)
+    player.speed = 2.0
+
+    player.play(now_ns=0)
+    player.service(0)
+    port.take()
+
+    assert player.service(249 * MS) == 0
+    assert player.service(250 * MS) == 1
+
+
+def test_player_seek():
+    track = []
+    for note in range(40):
+        track += [0x30, 0x90, note, 100]
+    track0 = [0x00, 0xFF, 0x51, 0x03, 0x07, 0xA1, 0x20] + END
+    player, port = player_for(track0, track + END, index_ticks=96)
+
+    player.seek(0x30 * 20 + 1)
+    assert player.position == 0x30 * 20 + 1
+    player.play(now_ns=0)
+    player.service(10_000 * MS)
+    notes = port.take()[1::3]
+    assert notes == list(range(20, 40))
+
+    player.seek(player.bar_to_tick(1))  # bar 1 is at tick 384, note 7
+    player.play(now_ns=0)
+    player.service(10_000 * MS)
+    assert port.take()[1::3] == list(range(7, 40))
+
+
+def test_player_loop():
+    track = [0x00, 0x90, 60, 100, 0x60, 0x80, 60, 0, 0x60, 0x90, 62, 100] + END
+    player, port = player_for(track)
+    player.set_loop(0, 192)
+
+    player.play(now_ns=0)
+    for i in range(100):
+        start = i * 1000 * MS  # 192 ticks at 120 bpm is a second
+        assert player.service(start + 499 * MS) == (1 if i == 0 else 0)
+        assert player.service(start + 500 * MS) == 1
+        port.take()
+        assert player.service(start + 999 * MS) == 0
+        assert player.service(start + 1000 * MS) == 1
+        # all notes off before looping around
+        assert port.take() == [0xB0, 123, 0, 0x90, 60, 100]
+
+    assert player.playing
+    player.clear_loop()
+    player.service(101_000 * MS)
+    assert not player.playing
+
+
+class FileStub(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((self.tell(), len(data)))
+        return super().write(data)
+
+
+def test_recorder_round_trip():
+    file = io.BytesIO()
+    recorder = tmidi_smf.Recorder(file, division=96, start_ns=1000 * MS)
+    msgs = [
+        tmidi.Message(tmidi.NOTE_ON, 60, 100),
+        tmidi.Message(tmidi.NOTE_ON, 64, 100),
+        tmidi.Message(tmidi.CLOCK),  # not recorded
+        tmidi.Message(tmidi.NOTE_OFF, 60, 0, channel=3),
+        tmidi.Message(tmidi.PITCH_BEND, -100, channel=2),
+        tmidi.Message(tmidi.PROGRAM_CHANGE, 7, channel=2),
+    ]
+    for i, msg in enumerate(msgs):
+        msg.time = 1000 * MS + i * 100_000 * MS  # 100 secs apart
+        recorder.record(msg)
+    recorder.close()
+
+    reader = tmidi_smf.Reader(file.getvalue())
+    read = list(reader.events())
+
+    assert recorder.message_count == 5
+    assert reader.format == 0
+    assert reader.division == 96
+    assert [m.time for m in read] == [0, 19200, 57600, 76800, 96000]
+    assert [bytes(m) for m in read] == [bytes(m) for i, m in enumerate(msgs) if i != 2]
+    assert list(reader.meta_events((tmidi_smf.META_TEMPO,))) == [
+        (0, tmidi_smf.META_TEMPO, (500_000).to_bytes(3, "big"))
+    ]
+    assert reader.error_count == 0
+
+
+def test_recorder_block_writes():
+    file = FileStub()
+    with tmidi_smf.Recorder(file, buf_size=64, start_ns=0) as recorder:
+        for i in range(100):
+            msg = tmidi.Message(tmidi.CC, 1, i % 128)
+            msg.time = (i + 1) * MS
+            recorder.record(msg)
+
+    # all but the last write are whole, aligned blocks
+    assert len(file.writes) > 3
+    assert all(pos % 64 == 0 and size == 64 for pos, size in file.writes[:-2])
+    pos, size = file.writes[-2]
+    assert pos % 64 == 0 and size < 64
+    assert file.writes[-1] == (18, 4)  # the track length
+    data = file.getvalue()
+    assert int.from_bytes(data[18:22], "big") == len(data) - 22
+    times = [m.time for m in tmidi_smf.Reader(data).events()]
+    assert times == [(i + 1) * 480 // 500 for i in range(100)]
+
+
+def test_recorder_sysex():
+    file = io.BytesIO()
+    with tmidi_smf.Recorder(file, start_ns=0) as recorder:
+        msg = tmidi.Message(tmidi.CC, 7, 100)
+        msg.time = 1
+        recorder.record(msg)
+        recorder.record(tmidi.Message(tmidi.SYSEX), data=b"\x7e\x01\x02")
+        recorder.record(msg)
+    data = file.getvalue()
+
+    assert b"\xf0\x04\x7e\x01\x02\xf7" in data
+    msgs = list(tmidi_smf.Reader(data).events())
+    assert [bytes(m) for m in msgs] == [bytes(msg)] * 2
+
+
+def test_recorder_sysex_chunks():
+    sysex = bytes(range(1, 11))
+    port = io.BytesIO(bytes((0xF0,)) + sysex + bytes((0xF7, 0x90, 60, 100)))
+    midi = tmidi.MIDI(midi_in=port, sysex_buf=bytearray(4))
+    file = io.BytesIO()
+    with tmidi_smf.Recorder(file, start_ns=0) as recorder:
+        while msg := midi.receive():
+            msg.time = 1
+            recorder.record(msg, midi.sysex_data, midi.sysex_complete)
+    data = file.getvalue()
+
+    # one SysEx, continued by escape events, with SYSEX_END only at its end
+    assert recorder.message_count == 2
+    assert b"\xf0\x04\x01\x02\x03\x04\x00\xf7\x04\x05\x06\x07\x08" in data
+    assert b"\x00\xf7\x03\x09\x0a\xf7\x00\x90" in data
+    assert data.count(b"\xf0") == 1
+    msgs = list(tmidi_smf.Reader(data).events())
+    assert [bytes(m) for m in msgs] == [bytes((0x90, 60, 100))]
@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+
+import tmidi
+import tmidi_state
+
+
+class OutPortStub:
+    def __init__(self):
+        self.written = []
+
+    def write(self, buf, nbytes):
+        self.written.append(bytes(buf[:nbytes]))
+
+
+def test_state_notes():
+    tracker = tmidi_state.Tracker()
+
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 64, 100))
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 60, 90))
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 127, 80, channel=15))
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 60, 110))  # retrigger
+
+    assert tracker.velocity(60) == 110
+    assert tracker.velocity(127, channel=15) == 80
+    assert tracker.velocity(61) == 0
+    assert tracker.held_count() == 3
+    assert tracker.held_count(0) == 2
+    assert list(tracker.held_notes(0)) == [60, 64]
+    assert list(tracker.held_notes()) == [60, 64, 127]
+
+    tracker.update(tmidi.Message(tmidi.NOTE_OFF, 60, 0))
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 64, 0))  # velocity 0 is note off
+    tracker.update(tmidi.Message(tmidi.NOTE_OFF, 65, 0))  # wasn't held
+
+    assert tracker.held_count(0) == 0
+    assert list(tracker.held_notes()) == [127]
+
+
+def test_state_controllers():
+    tracker = tmidi_state.Tracker()
+
+    tracker.update(tmidi.Message(tmidi.CC, 74, 63, channel=3))
+    tracker.update(tmidi.Message(tmidi.PITCH_BEND, -100, channel=2))
+    tracker.update(tmidi.Message(tmidi.PROGRAM_CHANGE, 7, channel=9))
+    tracker.update(tmidi.Message(tmidi.CHANNEL_PRESSURE, 42, channel=1))
+    tracker.update(tmidi.Message(tmidi.CLOCK))
+
+    assert tracker.control(74, channel=3) == 63
+    assert tracker.control(74) == 0
+    assert tracker.pitch_bends[2] == -100
+    assert tracker.pitch_bends[0] == 0
+    assert tracker.programs[9] == 7
+    assert tracker.pressures[1] == 42
+
+    tracker.reset()
+    assert tracker.control(74, channel=3) == 0
+    assert tracker.pitch_bends[2] == 0
+
+
+def test_state_all_notes_off_cc():
+    tracker = tmidi_state.Tracker()
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 60, 100, channel=1))
+    tracker.update(tmidi.Message(tmidi.NOTE_ON, 62, 100, channel=2))
+
+    tracker.update(tmidi.Message(tmidi.CC, 123, 0, channel=1))
+
+    assert list(tracker.held_notes()) == [62]
+    assert tracker.velocity(60, channel=1) == 0
+
+
+def test_state_all_notes_off():
+    port = OutPortStub()
+    midi = tmidi.MIDI(midi_out=port)
+    tracker = tmidi_state.Tracker()
+    for channel, note in ((0, 60), (0, 67), (5, 40)):
+        tracker.update(tmidi.Message(tmidi.NOTE_ON, note, 100, channel=channel))
+
+    assert tracker.all_notes_off(midi, channel=5) == 1
+    assert port.written == [bytes((0x85, 40, 0))]
+
+    port.written.clear()
+    assert tracker.all_notes_off(midi) == 2
+    assert port.written == [bytes((0x80, 60, 0, 0x80, 67, 0))]
+    assert tracker.held_count() == 0
+    assert tracker.all_notes_off(midi) == 0
+    assert len(port.written) == 1
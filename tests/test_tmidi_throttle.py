@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+
+import tmidi
+import tmidi_throttle
+
+
+class OutPortStub:
+    def __init__(self):
+        self.written = []
+
+    def write(self, buf, nbytes):
+        self.written.append(bytes(buf[:nbytes]))
+
+    def take(self):
+        data = list(b"".join(self.written))
+        self.written.clear()
+        return data
+
+
+MS = 1_000_000  # nanoseconds
+
+
+def make_throttle(**kwargs):
+    port = OutPortStub()
+    midi = tmidi.MIDI(midi_out=port)
+    return tmidi_throttle.Throttle(midi, **kwargs), port
+
+
+def test_throttle_coalesce():
+    throttle, port = make_throttle()
+
+    for i in range(100):
+        throttle.send(tmidi.Message(tmidi.CC, 1, i, channel=2))
+        throttle.send(tmidi.Message(tmidi.PITCH_BEND, i * 10))
+        throttle.send(tmidi.Message(tmidi.CHANNEL_PRESSURE, i, channel=1))
+        throttle.send(tmidi.Message(tmidi.AFTERTOUCH, 60, i, channel=3))
+
+    assert port.written == []
+    assert throttle.pending == 4
+    assert throttle.coalesced == 4 * 99
+    assert throttle.service(0) == 4
+    assert len(port.written) == 1  # all in one write
+    bend = tmidi.Message(tmidi.PITCH_BEND, 990)
+    assert port.take() == [
+        0xB2, 1, 99,
+        0xE0, bend.data0, bend.data1,
+        0xD1, 99,
+        0xA3, 60, 99,
+    ]  # fmt: skip
+    assert throttle.pending == 0
+
+
+def test_throttle_notes_first():
+    throttle, port = make_throttle()
+
+    throttle.send(tmidi.Message(tmidi.CC, 74, 10))
+    throttle.send(tmidi.Message(tmidi.NOTE_ON, 60, 100))
+    throttle.send(tmidi.Message(tmidi.CLOCK))
+    throttle.send(tmidi.Message(tmidi.CC, 64, 127))  # sustain isn't held back
+
+    assert port.take() == [0x90, 60, 100, 0xF8, 0xB0, 64, 127]
+    throttle.service(0)
+    assert port.take() == [0xB0, 74, 10]
+
+
+def test_throttle_channel_mode_in_order():
+    throttle, port = make_throttle()
+
+    throttle.send(tmidi.Message(tmidi.NOTE_ON, 60, 100))
+    throttle.send(tmidi.Message(tmidi.CC, 123, 0))  # all notes off
+    throttle.send(tmidi.Message(tmidi.NOTE_ON, 62, 100))
+    throttle.send(tmidi.Message(tmidi.CC, 121, 0))  # reset all controllers
+
+    assert port.take() == [0x90, 60, 100, 0xB0, 123, 0, 0x90, 62, 100, 0xB0, 121, 0]
+    assert throttle.pending == 0
+    assert throttle.service(0) == 0
+
+
+def test_throttle_budget():
+    # 3 bytes per msec, with room for two CCs saved up
+    throttle, port = make_throttle(bytes_per_sec=3000, burst=6)
+    for control in range(1, 6):
+        throttle.send(tmidi.Message(tmidi.CC, control, 1))
+
+    assert throttle.service(0) == 2
+    assert throttle.service(MS // 2) == 0
+    assert throttle.service(MS) == 1
+    # a note uses up budget too
+    throttle.send(tmidi.Message(tmidi.NOTE_ON, 60, 100))
+    assert throttle.service(2 * MS) == 0
+    assert throttle.service(3 * MS) == 1
+    assert port.take() == [
+        0xB0, 1, 1, 0xB0, 2, 1, 0xB0, 3, 1,
+        0x90, 60, 100,
+        0xB0, 4, 1,
+    ]  # fmt: skip
+    assert throttle.flush() == 1
+    assert throttle.pending == 0
+
+
+def test_throttle_interval():
+    throttle, _ = make_throttle(interval_ns=10 * MS)
+
+    throttle.send(tmidi.Message(tmidi.CC, 1, 1))
+    assert throttle.service(0) == 1
+    throttle.send(tmidi.Message(tmidi.CC, 1, 2))
+    assert throttle.service(5 * MS) == 0
+    assert throttle.service(10 * MS) == 1
+
+
+def test_throttle_max_pending():
+    throttle, port = make_throttle(max_pending=2)
+
+    for control in range(1, 4):
+        throttle.send(tmidi.Message(tmidi.CC, control, 1))
+
+    # the oldest went out to make room
+    assert port.take() == [0xB0, 1, 1]
+    assert throttle.pending == 2
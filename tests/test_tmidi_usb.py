@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+
+
+import tmidi
+import tmidi_usb
+
+
+def test_encode_many():
+    msgs = [
+        tmidi.Message(tmidi.NOTE_ON, 60, 100, channel=2),
+        tmidi.Message(tmidi.PROGRAM_CHANGE, 7),
+        tmidi.Message(tmidi.CLOCK),
+        tmidi.Message(tmidi.SONG_POSITION, 1, 2),
+        tmidi.Message(tmidi.TUNE_REQUEST),
+    ]
+    buf = bytearray(64)
+    nbytes = tmidi_usb.encode_many(msgs, buf, cable=1)
+    assert nbytes == 20
+    assert list(buf[:nbytes]) == [
+        0x19, 0x92, 60, 100,
+        0x1C, 0xC0, 7, 0,
+        0x1F, 0xF8, 0, 0,
+        0x13, 0xF2, 1, 2,
+        0x15, 0xF6, 0, 0,
+    ]  # fmt: skip
+
+
+def test_encode_sysex():
+    buf = bytearray(16)
+    assert tmidi_usb.encode_sysex(b"\x7d\x01\x02\x03", buf) == 8
+    assert list(buf[:8]) == [0x04, 0xF0, 0x7D, 0x01, 0x07, 0x02, 0x03, 0xF7]
+    assert tmidi_usb.encode_sysex(b"\x7d", buf) == 4
+    assert list(buf[:4]) == [0x07, 0xF0, 0x7D, 0xF7]
+    assert tmidi_usb.encode_sysex(b"\x7d\x01\x02\x03\x04", buf) == 12
+    assert list(buf[4:12]) == [0x04, 0x02, 0x03, 0x04, 0x05, 0xF7, 0, 0]
+    assert tmidi_usb.encode_sysex(b"\x7d\x01", buf) == 8
+    assert list(buf[:8]) == [0x04, 0xF0, 0x7D, 0x01, 0x05, 0xF7, 0, 0]
+
+
+def test_decode_round_trip():
+    msgs = [
+        tmidi.Message(tmidi.NOTE_ON, 60, 100, channel=2),
+        tmidi.Message(tmidi.CC, 74, 1, channel=15),
+        tmidi.Message(tmidi.CHANNEL_PRESSURE, 9),
+        tmidi.Message(tmidi.START),
+    ]
+    buf = bytearray(64)
+    nbytes = tmidi_usb.encode_many(msgs, buf, cable=3)
+    decoder = tmidi_usb.PacketDecoder()
+    decoded = list(decoder.decode(buf, nbytes))
+    assert [cable for cable, _ in decoded] == [3] * 4
+    assert [str(msg) for _, msg in decoded] == [str(msg) for msg in msgs]
+
+
+def test_decode_cable_mask_and_reuse():
+    buf = bytearray(8)
+    tmidi_usb.encode(tmidi.Message(tmidi.NOTE_ON, 60, 100), buf, 0, cable=0)
+    tmidi_usb.encode(tmidi.Message(tmidi.NOTE_ON, 62, 100), buf, 4, cable=1)
+    decoder = tmidi_usb.PacketDecoder(cable_mask=0b10)
+    msg = tmidi.Message()
+    decoded = list(decoder.decode(buf, msg=msg))
+    assert decoded == [(1, msg)]
+    assert msg.note == 62
+
+
+def test_decode_sysex():
+    buf = bytearray(64)
+    nbytes = tmidi_usb.encode_sysex(bytes(range(7)), buf, cable=2)
+    nbytes += tmidi_usb.encode(tmidi.Message(tmidi.STOP), buf, nbytes, cable=2)
+    decoder = tmidi_usb.PacketDecoder(sysex_size=5)
+    decoded = list(decoder.decode(buf, nbytes))
+    assert [(cable, msg.type) for cable, msg in decoded] == [
+        (2, tmidi.SYSEX),
+        (2, tmidi.STOP),
+    ]
+    assert bytes(decoder.sysex_data(2)) == bytes(range(5))
+    assert decoder.error_count == 1
@@ -59,8 +59,49 @@ __repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import time
+
 from micropython import const
 
+# A heap, for tmidi_scheduler and tmidi_smf
+try:
+    from heapq import heappop as _heappop, heappush as _heappush
+except ImportError:
+
+    def _heappush(heap, item):
+        # Push item onto heap, for ports without heapq
+        heap.append(item)
+        i = len(heap) - 1
+        while i:
+            parent = (i - 1) >> 1
+            if heap[parent] <= item:
+                break
+            heap[i] = heap[parent]
+            i = parent
+        heap[i] = item
+
+    def _heappop(heap):
+        # Pop the smallest item off heap, for ports without heapq
+        last = heap.pop()
+        if not heap:
+            return last
+        smallest = heap[0]
+        size = len(heap)
+        i = 0
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if last <= heap[child]:
+                break
+            heap[i] = heap[child]
+            i = child
+        heap[i] = last
+        return smallest
+
+
 # Message type constants.
 NOTE_OFF = const(0x80)
 """Note Off"""
@@ -103,69 +144,88 @@ ACTIVE_SENSING = const(0xFE)
 SYSTEM_RESET = const(0xFF)
 """System Reset"""
 
-_LEN_0_MESSAGES = set(
-    [
-        TUNE_REQUEST,
-        SYSEX,
-        SYSEX_END,
-        CLOCK,
-        TICK,
-        START,
-        CONTINUE,
-        STOP,
-        ACTIVE_SENSING,
-        SYSTEM_RESET,
-    ]
-)
-_LEN_1_MESSAGES = set([PROGRAM_CHANGE, CHANNEL_PRESSURE, SONG_SELECT, BUS_SELECT])
-_LEN_2_MESSAGES = set([NOTE_OFF, NOTE_ON, AFTERTOUCH, CC, PITCH_BEND, SONG_POSITION])
-
-_MSG_TYPE_NAMES = {
-    NOTE_OFF: "NoteOff",
-    NOTE_ON: "NoteOn",
-    AFTERTOUCH: "Aftertouch",
-    CC: "CC",
-    PROGRAM_CHANGE: "ProgramChange",
-    CHANNEL_PRESSURE: "ChannelPressure",
-    PITCH_BEND: "PitchBend",
-    SYSEX: "Sysex",
-    SONG_POSITION: "SongPosition",
-    SONG_SELECT: "SongSelect",
-    BUS_SELECT: "BusSelect",
-    TUNE_REQUEST: "TuneRequest",
-    SYSEX_END: "SysexEnd",
-    CLOCK: "Clock",
-    TICK: "Tick",
-    START: "Start",
-    CONTINUE: "Continue",
-    STOP: "Stop",
-    ACTIVE_SENSING: "ActiveSensing",
-    SYSTEM_RESET: "SystemReset",
-}
-
-
-def _is_channel_message(status_byte):
-    return status_byte >= NOTE_OFF and status_byte < SYSEX
-
-
-def _read_byte(port):
-    while not (buf := port.read(1)):
-        pass
-    return buf[0]
-
-
-# def _read_n_bytes(port, buf, dest, num_bytes):
-#     while num_bytes:
-#         if port.readinto(buf):
-#             dest.append(buf[0])
-#             num_bytes -= 1
-
-
-# def _read_byte_works(port):
-#     while True:
-#         buf = port.read(1)
-#         if buf:
-#             return buf[0]
+_LEN_1_MESSAGES = (PROGRAM_CHANGE, CHANNEL_PRESSURE, SONG_SELECT, BUS_SELECT)
+_LEN_2_MESSAGES = (NOTE_OFF, NOTE_ON, AFTERTOUCH, CC, PITCH_BEND, SONG_POSITION)
+
+_SYSEX_START_BYTE = bytes((SYSEX,))
+_SYSEX_END_BYTE = bytes((SYSEX_END,))
+
+# Flags in _STATUS_INFO, the low two bits hold the number of data bytes.
+# Not underscored, as MicroPython drops underscored const() names from the
+# module, and tmidi's sibling modules (tmidi_router etc.) import them.
+DATA_LEN_MASK = const(0x03)
+CHANNEL_MSG = const(0x04)
+REALTIME_MSG = const(0x08)
+
+
+def _make_status_info():
+    info = bytearray(256)
+    for status_byte in range(NOTE_OFF, 256):
+        if status_byte < SYSEX:
+            mtype = status_byte & 0xF0
+            flags = CHANNEL_MSG
+        else:
+            mtype = status_byte
+            flags = REALTIME_MSG if status_byte >= CLOCK else 0
+        if mtype in _LEN_2_MESSAGES:
+            flags |= 2
+        elif mtype in _LEN_1_MESSAGES:
+            flags |= 1
+        info[status_byte] = flags
+    return bytes(info)
+
+
+# Classification of every status byte (or message type), so that
+# a message is classified with a single index: _STATUS_INFO[status_byte]
+_STATUS_INFO = _make_status_info()
+
+
+def _make_accept(ignore=(), channel_mask=0xFFFF):
+    # Table of which status bytes to accept, indexed by status byte,
+    # for MIDI.set_filter() and tmidi_router routes
+    accept = bytearray(256)
+    for status_byte in range(NOTE_OFF, 256):
+        if _STATUS_INFO[status_byte] & CHANNEL_MSG:
+            ok = (channel_mask >> (status_byte & 0x0F)) & 1 and (
+                status_byte & 0xF0 not in ignore
+            )
+        else:
+            ok = status_byte not in ignore
+        accept[status_byte] = 1 if ok else 0
+    return accept
+
+
+# Filled in by _msg_type_name() the first time a message is printed
+_MSG_TYPE_NAMES = {}
+
+
+def _msg_type_name(mtype):
+    if not _MSG_TYPE_NAMES:
+        _MSG_TYPE_NAMES.update(
+            {
+                NOTE_OFF: "NoteOff",
+                NOTE_ON: "NoteOn",
+                AFTERTOUCH: "Aftertouch",
+                CC: "CC",
+                PROGRAM_CHANGE: "ProgramChange",
+                CHANNEL_PRESSURE: "ChannelPressure",
+                PITCH_BEND: "PitchBend",
+                SYSEX: "Sysex",
+                SONG_POSITION: "SongPosition",
+                SONG_SELECT: "SongSelect",
+                BUS_SELECT: "BusSelect",
+                TUNE_REQUEST: "TuneRequest",
+                SYSEX_END: "SysexEnd",
+                CLOCK: "Clock",
+                TICK: "Tick",
+                START: "Start",
+                CONTINUE: "Continue",
+                STOP: "Stop",
+                ACTIVE_SENSING: "ActiveSensing",
+                SYSTEM_RESET: "SystemReset",
+            }
+        )
+    return _MSG_TYPE_NAMES.get(mtype, "Unknown")
 
 
 class Message:
@@ -179,6 +239,11 @@ class Message:
         e.g. the velocity (0-127) for NOTE_ON messages.
     :param channel: The MIDI channel for this message, if applicable (0-15)
 
+    Received messages also have a ``time`` attribute: the ``time.monotonic_ns()``
+    time of the port read holding the message's status byte,
+    if the MIDI object has ``timestamps`` enabled, otherwise 0.
+    Messages read from a MIDI file by ``tmidi_smf`` have their time in ticks.
+
     Example of creating Messages:
 
     .. code-block:: python
@@ -203,36 +268,67 @@ class Message:
               print("program change:", msg.value)
     """
 
+    # No per-instance __dict__, to keep large message buffers small
+    __slots__ = ("type", "channel", "data0", "data1", "time")
+
     def __init__(self, mtype=SYSTEM_RESET, data0=0, data1=0, channel=0):
         self.type = mtype
         self.channel = channel
+        self.time = 0
+        if mtype == PITCH_BEND and data1 == 0:
+            # data0 is a signed pitch bend value, split it into two 7-bit bytes
+            data0 += 8192
+            data1 = data0 >> 7
+            data0 &= 0x7F
         self.data0 = data0
         self.data1 = data1
-        if mtype == PITCH_BEND and data1 == 0:
-            self.pitch_bend = data0
 
     def __bytes__(self):
         status_byte = self.type
-        if _is_channel_message(status_byte):
+        info = _STATUS_INFO[status_byte]
+        if info & CHANNEL_MSG:
             status_byte |= self.channel
-        if self.type in _LEN_2_MESSAGES:
+        data_len = info & DATA_LEN_MASK
+        if data_len == 2:
             return bytes([status_byte, self.data0, self.data1])
-        elif self.type in _LEN_1_MESSAGES:
+        if data_len == 1:
             return bytes([status_byte, self.data0])
         return bytes([status_byte])
 
+    def encode_into(self, buf, offset=0):
+        """Write the raw MIDI bytes of this message into a buffer.
+
+        :param buf: A ``bytearray`` (or other writable buffer) with room
+            for up to three bytes at ``offset``.
+        :param int offset: Position in ``buf`` to write at, default 0.
+        :returns int: Number of bytes written.
+        """
+        status_byte = self.type
+        info = _STATUS_INFO[status_byte]
+        if info & CHANNEL_MSG:
+            status_byte |= self.channel
+        buf[offset] = status_byte
+        data_len = info & DATA_LEN_MASK
+        if data_len:
+            buf[offset + 1] = self.data0
+            if data_len == 2:
+                buf[offset + 2] = self.data1
+        return data_len + 1
+
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
         mtype = self.type
-        type_str = "Message(" + _MSG_TYPE_NAMES.get(mtype, "Unknown")
-        ch_str = "ch:%d" % self.channel if _is_channel_message(mtype) else "-"
+        info = _STATUS_INFO[mtype]
+        type_str = "Message(" + _msg_type_name(mtype)
+        ch_str = "ch:%d" % self.channel if info & CHANNEL_MSG else "-"
         if mtype == PITCH_BEND:
             return "%s %s %d)" % (type_str, ch_str, self.pitch_bend)
-        if mtype in _LEN_2_MESSAGES:
+        data_len = info & DATA_LEN_MASK
+        if data_len == 2:
             return "%s %s %d %d)" % (type_str, ch_str, self.data0, self.data1)
-        if mtype in _LEN_1_MESSAGES:
+        if data_len == 1:
             return "%s %s %d)" % (type_str, ch_str, self.data0)
         return "%s)" % type_str
 
@@ -275,16 +371,115 @@ class Message:
         self.data0 = val
 
 
+class Stats:
+    """
+    Counters of what a MIDI object has received, found in ``MIDI.stats``.
+    These are cheap enough to leave running all the time.
+
+    * ``bytes_read``: bytes read from the port
+    * ``port_reads``: calls to the port's ``readinto()``
+    * ``filtered``: messages skipped by the ``MIDI.set_filter()`` filter
+    * ``orphan_data``: data bytes dropped because there was no status byte for them
+    * ``status_in_data``: messages dropped because a status byte arrived in their data
+    * ``sysex_overflow``: SysEx messages longer than ``sysex_max``
+    * ``buffer_overruns``: port reads that filled the input buffer, so more data
+      may have been waiting. If this grows, use a larger ``in_buf_size``
+      or call ``receive()`` more often.
+    * ``max_receive_ns``: the longest time a call parsing messages took,
+      if ``timing`` has been set True, which costs a little time itself
+
+    Example:
+
+    .. code-block:: python
+
+        midi.stats.timing = True
+        while True:
+            midi.receive()
+            if time.monotonic() - last_time > 5:
+                last_time = time.monotonic()
+                print(midi.stats.message_count(tmidi.NOTE_ON), "note ons,",
+                      midi.stats.errors, "errors")
+                midi.stats.reset()
+    """
+
+    def __init__(self):
+        self.timing = False
+        self.messages = [0] * 32
+        """Number of messages received, by message type, see ``message_count()``"""
+        self.reset()
+
+    def reset(self):
+        """Set all the counters back to 0."""
+        self.bytes_read = 0
+        self.port_reads = 0
+        self.filtered = 0
+        self.orphan_data = 0
+        self.status_in_data = 0
+        self.sysex_overflow = 0
+        self.buffer_overruns = 0
+        self.max_receive_ns = 0
+        for i in range(32):
+            self.messages[i] = 0
+
+    @property
+    def errors(self):
+        """Number of errors of all causes"""
+        return self.orphan_data + self.status_in_data + self.sysex_overflow
+
+    def message_count(self, mtype):
+        """Number of messages of a type received.
+
+        :param int mtype: The type of message, e.g. tmidi.NOTE_ON.
+        """
+        return self.messages[mtype >> 4 if mtype < SYSEX else mtype - 0xE0]
+
+
+# Default seconds to sleep between checks of an empty port in async receives
+_ASYNC_POLL_INTERVAL = 0.001
+
+
 class MIDI:
     """
     MIDI Parser, receiver and sender
     ``midi_in`` or ``midi_out`` *must* be set or both together.
 
-    :param midi_in: an object which implements ``read(length)``,
+    :param midi_in: an object which implements ``readinto(buf)``,
         set to ``usb_midi.ports[0]`` for USB MIDI, default None.
+        If it has ``in_waiting``, like ``busio.UART``, it is only read when
+        it has bytes waiting, and only for those, so its timeout doesn't
+        stall ``receive()``. Other ports should not wait for data, e.g. a
+        ``busio.UART`` should be made with ``timeout=0``.
     :param midi_out: an object which implements ``write(buffer, length)``,
         set to ``usb_midi.ports[1]`` for USB MIDI, default None.
     :param bool enable_running_status: Allow running status messages to work, default False.
+    :param int in_buf_size: Size of the input buffer ``midi_in`` is drained into
+        with ``readinto()``, default 64. One port read can then yield many messages.
+    :param int pool_size: If set, ``receive()`` hands back recycled Message objects
+        from a pool of this many instead of allocating new ones, default 0.
+        A pooled message is only valid until ``pool_size`` more messages are received.
+    :param int out_buf_size: Size of the output buffer messages are encoded into
+        before being written to ``midi_out``, default 64.
+    :param bool enable_running_status_out: Leave out the status byte of sent channel
+        messages when it repeats the previous one, default False.
+        NoteOff is also sent as NoteOn with velocity 0 while NoteOn is the
+        running status, which drops the NoteOff release velocity.
+    :param int running_status_refresh: With running status out, send the full
+        status byte again at least every this many messages, default 0 (never).
+    :param sysex_buf: A ``bytearray`` that received SysEx payload bytes are streamed into,
+        default None, which skips SysEx payloads. Each time it fills up, or the
+        SysEx ends, ``receive()`` returns a SYSEX Message and the chunk is available
+        from ``sysex_data``. Dumps larger than the buffer arrive as several chunks.
+    :param int sysex_max: Largest SysEx payload accepted, in bytes, default 0 (no limit).
+    :param bool sysex_truncate: What to do when a SysEx payload is larger than
+        ``sysex_max``: if True, deliver the first ``sysex_max`` bytes as a complete
+        SysEx, otherwise drop the rest of it. Default False. Both count as an error.
+    :param ignore: A sequence of message types for ``receive()`` to skip,
+        e.g. ``(tmidi.ACTIVE_SENSING, tmidi.CLOCK)``, default none.
+        See ``set_filter()``.
+    :param int channel_mask: Bit mask of the channels to receive channel messages on,
+        bit N for channel N (0-15), default 0xFFFF (all). See ``set_filter()``.
+    :param bool timestamps: Record ``time.monotonic_ns()`` times of received
+        messages in ``Message.time``, and of writes in ``send_time_ns``, default False.
 
     Example of sending MIDI over USB:
 
@@ -303,7 +498,7 @@ class MIDI:
         import board
         import busio
         import tmidi
-        uart = busio.UART(tx=board.TX, rx=board.RX, timeout=0.001)
+        uart = busio.UART(tx=board.TX, rx=board.RX, baudrate=31250, timeout=0)
         midi_uart = tmidi.MIDI(midi_out=uart)
         msg_on = tmidi.Message(tmidi.NOTE_ON, notenum, velocity)
         midi_uart.send(msg_on)
@@ -316,7 +511,7 @@ class MIDI:
         import busio
         import usb_midi
         import tmidi
-        uart = busio.UART(tx=board.TX, rx=board.RX, timeout=0.001)
+        uart = busio.UART(tx=board.TX, rx=board.RX, baudrate=31250, timeout=0)
         midi_uart = tmidi.MIDI(midi_in=uart, midi_out=uart)
         midi_usb = tmidi.MIDI(midi_in=usb_midi.ports[0], midi_out=usb_midi.ports[1])
 
@@ -327,78 +522,506 @@ class MIDI:
                 print("uart midi:", msg)
     """
 
-    def __init__(self, midi_in=None, midi_out=None, enable_running_status=False):
+    def __init__(
+        self,
+        midi_in=None,
+        midi_out=None,
+        enable_running_status=False,
+        in_buf_size=64,
+        pool_size=0,
+        out_buf_size=64,
+        enable_running_status_out=False,
+        running_status_refresh=0,
+        sysex_buf=None,
+        sysex_max=0,
+        sysex_truncate=False,
+        ignore=(),
+        channel_mask=0xFFFF,
+        timestamps=False,
+    ):
         self._in_port = midi_in
+        self._in_waiting = hasattr(midi_in, "in_waiting")
         self._out_port = midi_out
         self._running_status_enabled = enable_running_status
         self._running_status = None
         self._error_count = 0
-
-        # This input buffer holds what has been read from midi_in
-        self._read_buf = bytearray(1)
+        self.stats = Stats()
+        """Counters of received data, messages and errors, see ``Stats``"""
+
+        # This input buffer holds what has been read from midi_in,
+        # bytes from _in_pos up to _in_len are still to be parsed
+        self._in_buf = bytearray(in_buf_size)
+        self._in_mv = memoryview(self._in_buf)
+        self._in_pos = 0
+        self._in_len = 0
+
+        # Timestamps, of the last port read with data, the message being
+        # assembled and the last port write
+        self._timestamps = timestamps
+        self._read_ns = 0
+        self._msg_ns = 0
+        self._send_ns = 0
+
+        # Parser state, kept across receive() calls so a partially
+        # received message is finished when the rest of it arrives
+        self._status = 0  # status byte of message being assembled
+        self._need = 0  # data bytes still needed to finish it
+        self._len = 0  # total data bytes of message being assembled
+        self._data0 = 0
+        self._data1 = 0
+
+        # SysEx streaming state, payload bytes go into _sysex_buf
+        # and are handed out in chunks of up to its size
+        self._sysex_buf = sysex_buf or bytearray(0)
+        self._sysex_size = len(self._sysex_buf)
+        self._sysex_max = sysex_max
+        self._sysex_truncate = sysex_truncate
+        self._in_sysex = False
+        self._sysex_drop = False  # skipping the rest of an overlong SysEx
+        self._sysex_len = 0  # bytes in the chunk being filled
+        self._sysex_total = 0  # bytes in the whole SysEx so far
+        self._sysex_out = 0  # bytes in the chunk last handed out
+        self._sysex_complete = False
+
+        # Recycled messages handed out by receive() in pooled mode
+        self._pool = [Message() for _ in range(pool_size)]
+        self._pool_idx = 0
+
+        # Filter of received messages, nonzero for each status byte to receive
+        self._accept = bytearray(256)
+        self.set_filter(ignore, channel_mask)
+
+        # Handlers called by poll(), indexed by status byte. Handlers for a
+        # particular note or CC number are in a 128-entry list for their status byte.
+        self._handlers = [None] * 256
+        self._number_handlers = [None] * 256
+
+        # Messages are encoded into this output buffer and written from it
+        self._out_buf = bytearray(max(out_buf_size, 3))
+
+        # Running status on output, last status byte sent and messages since
+        self._running_status_out = enable_running_status_out
+        self._running_status_refresh = running_status_refresh
+        self._out_status = 0
+        self._out_status_count = 0
 
     @property
     def error_count(self):
         """Number of errors encountered when parsing received messages"""
         return self._error_count
 
+    @property
+    def receive_time_ns(self):
+        """With ``timestamps``, the ``time.monotonic_ns()`` time of the last
+        message other than a real-time message received or handled by ``poll()``,
+        like ``Message.time``"""
+        return self._msg_ns
+
+    @property
+    def send_time_ns(self):
+        """With ``timestamps``, the ``time.monotonic_ns()`` time of the last write
+        to ``midi_out``, just before the bytes were written"""
+        return self._send_ns
+
+    def set_filter(self, ignore=(), channel_mask=0xFFFF):
+        """Set which received messages ``receive()`` skips.
+        Skipped messages are discarded as soon as they are parsed,
+        without building Message objects for them.
+
+        :param ignore: A sequence of message types to skip,
+            e.g. ``(tmidi.ACTIVE_SENSING, tmidi.CLOCK)``, default none.
+        :param int channel_mask: Bit mask of the channels to receive channel
+            messages on, bit N for channel N (0-15), default 0xFFFF (all).
+        """
+        self._accept = _make_accept(ignore, channel_mask)
+
+    @property
+    def sysex_data(self):
+        """The payload bytes of the SysEx chunk last returned by ``receive()``,
+        as a ``memoryview`` into ``sysex_buf``. Only valid until the next call to
+        ``receive()``. Does not include the SYSEX and SYSEX_END bytes."""
+        return memoryview(self._sysex_buf)[: self._sysex_out]
+
+    @property
+    def sysex_complete(self):
+        """True if the SysEx chunk last returned by ``receive()`` is the end of the SysEx"""
+        return self._sysex_complete
+
+    def _fill(self):
+        # Refill the input buffer once it has been fully parsed.
+        # Reading into the whole buffer avoids allocating memoryview slices.
+        # A port with in_waiting is only asked for the bytes it has, as its
+        # readinto() would wait out its timeout for the rest of the buffer.
+        # Those are read into a slice, as not every readinto() takes a length.
+        self._in_pos = 0
+        if self._in_waiting:
+            waiting = self._in_port.in_waiting
+            if not waiting:
+                self._in_len = 0
+                return 0
+            if waiting < len(self._in_buf):
+                buf = self._in_mv[:waiting]
+            else:
+                buf = self._in_buf
+            self._in_len = self._in_port.readinto(buf) or 0
+        else:
+            self._in_len = self._in_port.readinto(self._in_buf) or 0
+        stats = self.stats
+        stats.port_reads += 1
+        if self._in_len:
+            stats.bytes_read += self._in_len
+            # a full buffer means the port may have had more waiting
+            if self._in_len == len(self._in_buf):
+                stats.buffer_overruns += 1
+            if self._timestamps:
+                self._read_ns = time.monotonic_ns()
+        return self._in_len
+
+    def _parse(self):
+        # Consume buffered bytes until a whole message is assembled and
+        # return its status byte, or return 0 when the port has no more data.
+        # Message data is left in _data0 and _data1.
+        buf = self._in_buf
+        stats = self.stats
+        start_ns = time.monotonic_ns() if stats.timing else 0
+        while True:
+            if self._in_pos >= self._in_len and not self._fill():
+                status_byte = 0
+                break
+            b = buf[self._in_pos]
+            self._in_pos += 1
+
+            if self._in_sysex:
+                if not b & 0x80:
+                    if self._sysex_byte(b):
+                        status_byte = SYSEX
+                        break
+                    continue
+                if b < CLOCK:
+                    # Any status byte but real-time ends the SysEx,
+                    # normally SYSEX_END. Others are parsed on the next pass.
+                    self._in_sysex = False
+                    if b != SYSEX_END:
+                        self._in_pos -= 1
+                    if self._sysex_drop:
+                        continue
+                    self._deliver_sysex(True)
+                    status_byte = SYSEX
+                    break
+
+            if b == SYSEX:
+                if self._need:
+                    self._error_count += 1
+                    stats.status_in_data += 1
+                self._need = 0
+                self._in_sysex = True
+                self._msg_ns = self._read_ns
+                # an ignored SysEx is skipped like an overlong one
+                self._sysex_drop = not self._accept[SYSEX]
+                if self._sysex_drop:
+                    stats.filtered += 1
+                self._sysex_len = 0
+                self._sysex_total = 0
+                continue
+
+            if b & 0x80:
+                info = _STATUS_INFO[b]
+                # Real-time messages may appear anywhere, even between the data
+                # bytes of another message. Hand them out at once and leave the
+                # interrupted message to be finished by the following bytes.
+                if info & REALTIME_MSG:
+                    if self._accept[b]:
+                        status_byte = b
+                        break
+                    stats.filtered += 1
+                    continue
+                # Any other status byte inside data means we're out of sync,
+                # so discard the partial message and start over.
+                if self._need:
+                    self._error_count += 1
+                    stats.status_in_data += 1
+                # Only set the running status byte for channel messages.
+                if info & CHANNEL_MSG:
+                    self._running_status = b
+                self._status = b
+                self._msg_ns = self._read_ns
+                self._len = self._need = info & DATA_LEN_MASK
+                self._data0 = 0
+                self._data1 = 0
+                if not self._need:
+                    if self._accept[b]:
+                        status_byte = b
+                        break
+                    stats.filtered += 1
+                continue
+
+            if not self._need:
+                # Data byte with no message in progress,
+                # see if we have a running status byte.
+                if not (self._running_status_enabled and self._running_status):
+                    self._error_count += 1
+                    stats.orphan_data += 1
+                    continue
+                self._status = self._running_status
+                self._msg_ns = self._read_ns
+                self._len = self._need = _STATUS_INFO[self._status] & DATA_LEN_MASK
+                self._data1 = 0
+
+            self._need -= 1
+            if self._need:
+                self._data0 = b
+                continue
+            if self._len == 2:
+                self._data1 = b
+            else:
+                self._data0 = b
+            # Ignored messages are parsed all the same to stay in sync,
+            # but never turned into Message objects.
+            if self._accept[self._status]:
+                status_byte = self._status
+                break
+            stats.filtered += 1
+
+        if status_byte:
+            # channel message types count in 8-14, system messages in 16-31
+            stats.messages[
+                status_byte >> 4 if status_byte < SYSEX else status_byte - 0xE0
+            ] += 1
+        if start_ns:
+            start_ns = time.monotonic_ns() - start_ns
+            if start_ns > stats.max_receive_ns:
+                stats.max_receive_ns = start_ns
+        return status_byte
+
+    def _sysex_byte(self, b):
+        # Store a SysEx payload byte. Returns True if the buffer is full, in which
+        # case the byte is left unparsed and the full chunk must be handed out.
+        if self._sysex_drop:
+            return False
+        if self._sysex_max and self._sysex_total >= self._sysex_max:
+            # Too long, skip the rest of it, but deliver what fits if truncating
+            self._error_count += 1
+            self.stats.sysex_overflow += 1
+            self._sysex_drop = True
+            if self._sysex_truncate:
+                self._deliver_sysex(True)
+                return True
+            return False
+        if not self._sysex_size:
+            self._sysex_total += 1
+            return False
+        if self._sysex_len >= self._sysex_size:
+            self._in_pos -= 1
+            self._deliver_sysex(False)
+            return True
+        self._sysex_buf[self._sysex_len] = b
+        self._sysex_len += 1
+        self._sysex_total += 1
+        return False
+
+    def _deliver_sysex(self, complete):
+        self._sysex_out = self._sysex_len
+        self._sysex_complete = complete
+        self._sysex_len = 0
+        self._data0 = 0
+        self._data1 = 0
+
     def receive(self):
         """Read message from MIDI port, parse that data and
         return the first MIDI message (event).
-        This maintains the blocking characteristics of the midi_in port.
-        Relies on the port to buffer the incoming unread MIDI messages.
+        The port is drained into an internal buffer with ``readinto()``,
+        so one port read can hold many messages.
+        Parsing is incremental: if the port runs out of data partway
+        through a message, None is returned at once and the message
+        is completed on a later call. This doesn't wait for data,
+        unless the midi_in port waits in ``readinto()`` and has no ``in_waiting``.
 
         :returns Message object: Returns object or None for nothing.
         """
+        if self._pool:
+            msg = self._pool[self._pool_idx]
+            if not self.receive_into(msg):
+                return None
+            self._pool_idx = (self._pool_idx + 1) % len(self._pool)
+            return msg
 
-        # Read the status byte for the next message.
-        # note: this will block if the port is set to have a timeout
-        status_byte_buf = self._in_port.read(1)
-
-        # No message ready.
-        if not status_byte_buf:
+        status_byte = self._parse()
+        if not status_byte:
             return None
+        return self._fill_message(Message(), status_byte)
+
+    def receive_many(self, max_count=16):
+        """Receive every message waiting on the MIDI port, up to ``max_count``.
+        Stops as soon as the port is empty, so a burst of messages
+        (like a preset recall) is read with a single call.
+
+        In pooled mode, ``max_count`` should not be more than ``pool_size``,
+        or earlier messages in the list will be overwritten by later ones.
+
+        :param int max_count: Most messages to return, default 16.
+        :returns list: List of Message objects, empty if there were none.
+        """
+        msgs = []
+        while len(msgs) < max_count:
+            msg = self.receive()
+            if not msg:
+                break
+            msgs.append(msg)
+        return msgs
+
+    def pending(self):
+        """Iterate over the messages waiting on the MIDI port,
+        stopping as soon as the port is empty.
+
+        Example:
+
+        .. code-block:: python
+
+            for msg in midi.pending():
+                print(msg)
+        """
+        while msg := self.receive():
+            yield msg
 
-        # Is this actually a status byte?
-        status_byte = status_byte_buf[0]
-        is_status = status_byte & 0x80
+    def on(self, mtype, handler, channel=None, number=None):
+        """Register a handler for received messages, called by ``poll()``.
+        Handlers are called with unpacked arguments, ``handler(channel, data0, data1)``,
+        so no Message object is created. ``channel`` is 0 for system messages,
+        and for a SYSEX message the payload is in ``sysex_data``.
 
-        # If not, see if we have a running status byte.
-        if not is_status:
-            if self._running_status_enabled and self._running_status:
-                status_byte = self._running_status
-            # If not a status byte and no running status, this is invalid data.
+        :param int mtype: The type of message to handle, e.g. tmidi.NOTE_ON.
+        :param handler: The function to call, or None to remove the handler.
+        :param int channel: Only handle messages on this channel (0-15),
+            default None (all channels).
+        :param int number: Only handle messages whose first data byte is this
+            number (0-127), e.g. a CC number or note number, default None (all).
+            Takes precedence over a handler for all numbers.
+
+        Example:
+
+        .. code-block:: python
+
+            def note_on(channel, note, velocity):
+                print("note on:", channel, note, velocity)
+
+            def mod_wheel(channel, cc, value):
+                print("mod wheel:", channel, value)
+
+            midi.on(tmidi.NOTE_ON, note_on)
+            midi.on(tmidi.CC, mod_wheel, number=1)
+            while True:
+                midi.poll()
+        """
+        if _STATUS_INFO[mtype] & CHANNEL_MSG:
+            channels = range(16) if channel is None else (channel,)
+            status_bytes = [mtype | ch for ch in channels]
+        else:
+            status_bytes = (mtype,)
+        for status_byte in status_bytes:
+            if number is None:
+                self._handlers[status_byte] = handler
+                continue
+            if not self._number_handlers[status_byte]:
+                self._number_handlers[status_byte] = [None] * 128
+            self._number_handlers[status_byte][number] = handler
+
+    def poll(self, max_count=16):
+        """Receive the messages waiting on the MIDI port, up to ``max_count``,
+        and call the handlers registered with ``on()`` for them.
+        Messages with no handler are discarded.
+
+        :param int max_count: Most messages to handle, default 16.
+        :returns int: Number of messages received.
+        """
+        count = 0
+        while count < max_count:
+            status_byte = self._parse()
+            if not status_byte:
+                break
+            count += 1
+            info = _STATUS_INFO[status_byte]
+            handler = None
+            if number_handlers := self._number_handlers[status_byte]:
+                handler = number_handlers[self._data0]
+            if not handler:
+                handler = self._handlers[status_byte]
+                if not handler:
+                    continue
+            if info & CHANNEL_MSG:
+                handler(status_byte & 0x0F, self._data0, self._data1)
+            elif info & REALTIME_MSG:
+                handler(0, 0, 0)
             else:
-                self._error_count += 1
-                return None
+                handler(0, self._data0, self._data1)
+        return count
+
+    async def receive_async(self, poll_interval=_ASYNC_POLL_INTERVAL):
+        """Wait for and return the next received message, letting other
+        asyncio tasks run while the MIDI port is empty.
+
+        :param float poll_interval: Seconds to sleep between checks of an empty port,
+            default 0.001.
+        :returns Message object: The received message.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        while not (msg := self.receive()):
+            await asyncio.sleep(poll_interval)
+        return msg
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.receive_async()
+
+    async def send_async(self, msg, channel=None):
+        """Send a MIDI message like ``send()``, then let other asyncio tasks run.
 
-        message = Message(status_byte)
+        :param msg: Either a Message object or a sequence (list) of Message objects.
+        :param int channel: Channel number, if not set, the msg's channel will be used.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        self.send(msg, channel)
+        await asyncio.sleep(0)
+
+    def receive_into(self, msg):
+        """Like ``receive()``, but fill in a caller-owned Message in place
+        instead of creating a new one. Use this to receive without allocating.
+
+        :param Message msg: The message to overwrite with the received message.
+        :returns Message object: Returns ``msg`` or None for nothing,
+            in which case ``msg`` is left unchanged.
+        """
+        status_byte = self._parse()
+        if not status_byte:
+            return None
+        return self._fill_message(msg, status_byte)
 
+    def _fill_message(self, msg, status_byte):
         # Is this a channel message, if so, let's figure out the right
         # message type and set the message's channel property.
-        if _is_channel_message(status_byte):
-            # Only set the running status byte for channel messages.
-            self._running_status = status_byte
+        if _STATUS_INFO[status_byte] & CHANNEL_MSG:
             # Mask off the channel nibble.
-            message.type = status_byte & 0xF0
-            message.channel = status_byte & 0x0F
-
-        # Read the appropriate number of bytes for each message type.
-        if message.type in _LEN_2_MESSAGES:
-            message.data0 = _read_byte(self._in_port)
-            message.data1 = _read_byte(self._in_port)
-        elif message.type in _LEN_1_MESSAGES:
-            message.data0 = _read_byte(self._in_port)
-
-        # Check the data bytes for corruption. status bytes in data
-        # means we're out of sync, so discard.
-        # TODO: Figure out a better way to detect and deal with this upstream.
-        for b in (message.data0 or 0, message.data1 or 0):
-            if b & 0x80:
-                self._error_count += 1
-                return None
-
-        return message
+            msg.type = status_byte & 0xF0
+            msg.channel = status_byte & 0x0F
+            msg.data0 = self._data0
+            msg.data1 = self._data1
+            msg.time = self._msg_ns
+            return msg
+        msg.type = status_byte
+        msg.channel = 0
+        if _STATUS_INFO[status_byte] & REALTIME_MSG:
+            # _data0 and _data1 may belong to an interrupted message
+            msg.data0 = 0
+            msg.data1 = 0
+            msg.time = self._read_ns
+        else:
+            msg.data0 = self._data0
+            msg.data1 = self._data1
+            msg.time = self._msg_ns
+        return msg
 
     def send(self, msg, channel=None):
         """Send a MIDI message.
@@ -409,15 +1032,213 @@ class MIDI:
         """
 
         if isinstance(msg, Message):
-            if channel:
+            if channel is not None:
                 msg.channel = channel
-            # bytes(object) does not work in uPy
-            data = msg.__bytes__()
+            # encode into the reusable output buffer, bytes(object) does not work in uPy
+            self._write(self._out_buf, self._encode(msg, self._out_buf, 0))
         else:
-            data = bytearray()
-            for each_msg in msg:
-                if channel:
-                    each_msg.channel = channel
-                data.extend(each_msg.__bytes__())
+            self.send_many(msg, channel)
 
-        self._out_port.write(data, len(data))
+    def send_many(self, msgs, channel=None):
+        """Send a sequence of MIDI messages, like a chord or a batch of CCs,
+        packed together into as few port writes as the output buffer allows.
+
+        :param msgs: A sequence (list) of Message objects.
+            The channel property will be *updated* as a side-effect of sending messages.
+        :param int channel: Channel number, if not set, each msg's channel will be used.
+        """
+        buf = self._out_buf
+        size = len(buf)
+        pos = 0
+        for msg in msgs:
+            if pos + (_STATUS_INFO[msg.type] & DATA_LEN_MASK) >= size:
+                self._write(buf, pos)
+                pos = 0
+            if channel is not None:
+                msg.channel = channel
+            pos += self._encode(msg, buf, pos)
+        if pos:
+            self._write(buf, pos)
+
+    def send_sysex(self, data, start=True, end=True):
+        """Send a SysEx message, writing its payload straight from ``data``
+        without copying it.
+
+        :param data: The SysEx payload (not including SYSEX and SYSEX_END bytes),
+            any buffer like ``bytes``, ``bytearray`` or ``memoryview``.
+        :param bool start: Send the SYSEX byte first, default True.
+        :param bool end: Send the SYSEX_END byte last, default True.
+            Set ``start`` or ``end`` to False to stream a large SysEx in pieces.
+        """
+        # SysEx cancels running status
+        self._out_status = 0
+        if start:
+            self._write(_SYSEX_START_BYTE, 1)
+        if data:
+            self._write(data, len(data))
+        if end:
+            self._write(_SYSEX_END_BYTE, 1)
+
+    def _write(self, buf, nbytes):
+        if self._timestamps:
+            self._send_ns = time.monotonic_ns()
+        self._out_port.write(buf, nbytes)
+
+    def _encode(self, msg, buf, pos):
+        # Encode msg into buf at pos, leaving out a repeated status byte
+        # if running status out is enabled. Returns the number of bytes written.
+        if not self._running_status_out:
+            return msg.encode_into(buf, pos)
+        mtype = msg.type
+        info = _STATUS_INFO[mtype]
+        if not info & CHANNEL_MSG:
+            # System common messages cancel running status, real-time ones don't.
+            if not info & REALTIME_MSG:
+                self._out_status = 0
+            return msg.encode_into(buf, pos)
+
+        data1 = msg.data1
+        status_byte = mtype | msg.channel
+        if mtype == NOTE_OFF and self._out_status == NOTE_ON | msg.channel:
+            status_byte = self._out_status
+            data1 = 0
+
+        start = pos
+        refresh = self._running_status_refresh
+        if status_byte != self._out_status or (
+            refresh and self._out_status_count >= refresh
+        ):
+            buf[pos] = status_byte
+            pos += 1
+            self._out_status = status_byte
+            self._out_status_count = 0
+        self._out_status_count += 1
+
+        buf[pos] = msg.data0
+        pos += 1
+        if info & DATA_LEN_MASK == 2:
+            buf[pos] = data1
+            pos += 1
+        return pos - start
+
+
+class Merge:
+    """
+    Merge the messages received by several MIDI objects into one asyncio stream.
+    Ports are checked in turn, starting after the one that last had a message,
+    so a busy port can't starve the others.
+
+    :param midis: The MIDI objects to receive from.
+    :param float poll_interval: Seconds to sleep when all ports are empty, default 0.001.
+
+    Example of merging USB and UART MIDI:
+
+    .. code-block:: python
+
+        import asyncio
+        import tmidi
+
+        async def main():
+            async for midi_in, msg in tmidi.Merge(midi_usb, midi_uart):
+                print("usb" if midi_in is midi_usb else "uart", msg)
+
+        asyncio.run(main())
+    """
+
+    def __init__(self, *midis, poll_interval=_ASYNC_POLL_INTERVAL):
+        self._midis = midis
+        self._poll_interval = poll_interval
+        self._next = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.receive_async()
+
+    async def receive_async(self):
+        """Wait for the next message from any of the MIDI objects.
+
+        :returns tuple: ``(midi, msg)``, the MIDI object the Message came from
+            and the Message.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        midis = self._midis
+        count = len(midis)
+        while True:
+            for i in range(count):
+                idx = (self._next + i) % count
+                if msg := midis[idx].receive():
+                    self._next = (idx + 1) % count
+                    return midis[idx], msg
+            await asyncio.sleep(self._poll_interval)
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies, in power-of-two microsecond buckets,
+    cheap enough to keep adding to while running.
+    Bucket 0 counts latencies under 1 usec, bucket N counts latencies
+    from 2**(N-1) up to 2**N usec, and the last bucket counts everything longer.
+
+    :param int num_buckets: Number of buckets, default 24 (up to about 8 seconds).
+
+    Example of measuring the thru latency of a USB to UART forwarder:
+
+    .. code-block:: python
+
+        midi_usb = tmidi.MIDI(midi_in=usb_midi.ports[0], timestamps=True)
+        midi_uart = tmidi.MIDI(midi_out=uart, timestamps=True)
+        latency = tmidi.LatencyHistogram()
+        while True:
+            if msg := midi_usb.receive():
+                midi_uart.send(msg)
+                latency.add(midi_uart.send_time_ns - msg.time)
+            if latency.count >= 1000:
+                print("99%% under %d usec" % (latency.percentile(99) // 1000))
+                latency.reset()
+    """
+
+    def __init__(self, num_buckets=24):
+        self.buckets = [0] * num_buckets
+        """The count of latencies in each bucket"""
+        self.count = 0
+        """Number of latencies added"""
+        self.max_ns = 0
+        """The largest latency added, in nanoseconds"""
+
+    def add(self, latency_ns):
+        """Add a latency, in nanoseconds."""
+        if latency_ns > self.max_ns:
+            self.max_ns = latency_ns
+        usec = latency_ns // 1000
+        last = len(self.buckets) - 1
+        i = 0
+        while usec and i < last:
+            usec >>= 1
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+
+    def percentile(self, pct):
+        """The latency, in nanoseconds, that ``pct`` percent of the added
+        latencies are under, rounded up to the top of its bucket.
+
+        :param float pct: The percentile (0-100).
+        """
+        target = self.count * pct / 100
+        total = 0
+        # the last bucket has no top, so stop before it
+        for i in range(len(self.buckets) - 1):
+            total += self.buckets[i]
+            if total >= target:
+                return min((1 << i) * 1000, self.max_ns)
+        return self.max_ns
+
+    def reset(self):
+        """Forget all the added latencies."""
+        for i in range(len(self.buckets)):
+            self.buckets[i] = 0
+        self.count = 0
+        self.max_ns = 0
@@ -0,0 +1,345 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_router`
+================================================================================
+
+Raw MIDI byte router and forwarder for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+A Router forwards MIDI between ports without parsing messages into
+``tmidi.Message`` objects and encoding them again. Each input is read into
+a buffer, messages are framed with tmidi's status byte table, and runs of
+whole messages are written straight from that buffer to each output.
+Filters and channel remaps are applied as the bytes go by.
+
+"""
+
+import time
+
+import tmidi
+from tmidi import (
+    CHANNEL_MSG,
+    DATA_LEN_MASK,
+    REALTIME_MSG,
+    _make_accept,
+    _STATUS_INFO,
+)
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+
+class _Input:
+    def __init__(self, port, buf_size):
+        self.port = port
+        self.has_in_waiting = hasattr(port, "in_waiting")
+        self.buf = bytearray(max(buf_size, 4))
+        self.mv = memoryview(self.buf)
+        self.carry = 0  # bytes of a partial message kept at the start of buf
+        self.running_status = 0
+        self.in_sysex = False
+        self.held = False  # stopped at a message for an output in another's SysEx
+        self.routes = []
+
+
+class _Output:
+    def __init__(self, port):
+        self.port = port
+        self.status = 0  # last channel status byte written, for running status
+        self.status_buf = bytearray(1)
+        self.sysex_input = None  # the input sending a SysEx to this output
+
+    def write_status(self, status_byte):
+        self.status_buf[0] = status_byte
+        self.port.write(self.status_buf, 1)
+        self.status = status_byte
+
+
+class _Route:
+    def __init__(self, output, accept, channel_map):
+        self.output = output
+        self.accept = accept
+        self.channel_map = channel_map
+        self.run = 0  # start of the bytes in the input buffer not yet written
+
+    def flush(self, inp, end):
+        # Write the run of bytes up to end, and start a new run there
+        if end > self.run:
+            if self.run:
+                self.output.port.write(inp.mv[self.run : end], end - self.run)
+            else:
+                self.output.port.write(inp.buf, end)
+        self.run = end
+
+
+class Router:
+    """
+    Forward MIDI bytes from input ports to output ports, without building
+    Message objects. Several inputs may be routed to the same output
+    to merge them, and an input may be routed to several outputs.
+    Running status from an input is kept when possible, and status bytes
+    are added back where routes merge or remap channels. While an input is
+    sending a SysEx to an output, other inputs' messages for that output are
+    held back until it ends, except real-time messages.
+
+    :param int in_buf_size: Size of the buffer each input is read into, default 64.
+    :param histogram: A ``tmidi.LatencyHistogram`` to add the latency the router
+        adds to, from each input port read to the end of its writes, default None.
+
+    Example of a USB to UART MIDI thru box with channel 1 remapped to channel 10:
+
+    .. code-block:: python
+
+        import board
+        import busio
+        import usb_midi
+        import tmidi_router
+
+        uart = busio.UART(tx=board.TX, rx=board.RX, baudrate=31250, timeout=0)
+        router = tmidi_router.Router()
+        router.add_route(usb_midi.ports[0], uart, channel_map={0: 9})
+        router.add_route(uart, usb_midi.ports[1])
+        while True:
+            router.service()
+    """
+
+    def __init__(self, in_buf_size=64, histogram=None):
+        self._in_buf_size = in_buf_size
+        self._histogram = histogram
+        self._inputs = []
+        self._outputs = []
+        self._error_count = 0
+        self._sysex_outputs = 0  # number of outputs in the middle of a SysEx
+
+    @property
+    def error_count(self):
+        """Number of invalid bytes dropped from the inputs"""
+        return self._error_count
+
+    def add_route(
+        self, midi_in, midi_out, ignore=(), channel_mask=0xFFFF, channel_map=None
+    ):
+        """Forward MIDI from an input port to an output port.
+
+        :param midi_in: An object which implements ``readinto(buf)``,
+            like ``usb_midi.ports[0]`` or a ``busio.UART``. If it has
+            ``in_waiting``, like ``busio.UART``, it is only read for the bytes
+            it has waiting, so its timeout doesn't stall ``service()``.
+            Other ports should not wait for data.
+        :param midi_out: An object which implements ``write(buffer, length)``,
+            like ``usb_midi.ports[1]`` or a ``busio.UART``.
+        :param ignore: A sequence of message types not to forward,
+            e.g. ``(tmidi.ACTIVE_SENSING, tmidi.CLOCK)``, default none.
+        :param int channel_mask: Bit mask of the channels to forward channel
+            messages on, bit N for channel N (0-15), default 0xFFFF (all).
+        :param dict channel_map: Channels to move channel messages to,
+            e.g. ``{0: 9}`` sends channel 0 messages out on channel 9, default None.
+            The map applies to the channels before ``channel_mask`` filtering.
+        """
+        inp = None
+        for each_in in self._inputs:
+            if each_in.port is midi_in:
+                inp = each_in
+        if inp is None:
+            inp = _Input(midi_in, self._in_buf_size)
+            self._inputs.append(inp)
+        out = None
+        for each_out in self._outputs:
+            if each_out.port is midi_out:
+                out = each_out
+        if out is None:
+            out = _Output(midi_out)
+            self._outputs.append(out)
+
+        accept = _make_accept(ignore, channel_mask)
+
+        remap = None
+        if channel_map:
+            remap = bytearray(range(16))
+            for channel, new_channel in channel_map.items():
+                remap[channel] = new_channel
+
+        inp.routes.append(_Route(out, accept, remap))
+
+    def service(self):
+        """Read each input port once and forward what was read.
+        Call this often, e.g. every time through the main loop.
+
+        :returns int: Number of bytes read from all inputs.
+        """
+        count = 0
+        for inp in self._inputs:
+            count += self._service_input(inp)
+        return count
+
+    def _service_input(self, inp):
+        buf = inp.buf
+        carry = inp.carry
+        room = len(buf) - carry  # none when full of held back messages
+        if inp.has_in_waiting and room:
+            # only ask for what's there, rather than wait out the port's timeout
+            room = min(room, inp.port.in_waiting)
+        if room == len(buf):
+            nbytes = inp.port.readinto(buf) or 0
+        elif room:
+            nbytes = inp.port.readinto(inp.mv[carry : carry + room]) or 0
+        else:
+            nbytes = 0
+        if not nbytes and not inp.held:
+            return 0
+        inp.held = False
+        if self._histogram:
+            read_ns = time.monotonic_ns()
+        end = carry + nbytes
+        for route in inp.routes:
+            route.run = 0
+
+        pos = 0
+        while pos < end:
+            b = buf[pos]
+
+            if inp.in_sysex:
+                # SysEx bytes are forwarded as they arrive, up to SYSEX_END.
+                # Any other status byte but real-time ends the SysEx too.
+                i = pos
+                while i < end:
+                    c = buf[i]
+                    if c & 0x80 and c < tmidi.CLOCK:
+                        inp.in_sysex = False
+                        if c == tmidi.SYSEX_END:
+                            i += 1
+                        break
+                    i += 1
+                self._forward(inp, tmidi.SYSEX, pos, i - pos, True)
+                pos = i
+                if not inp.in_sysex:
+                    self._end_sysex(inp)
+                continue
+
+            if b & 0x80:
+                info = _STATUS_INFO[b]
+                if info & REALTIME_MSG:
+                    self._forward(inp, b, pos, 1, True)
+                    pos += 1
+                    continue
+                if b == tmidi.SYSEX:
+                    if self._sysex_outputs and self._held(inp, b):
+                        break
+                    inp.in_sysex = True
+                    inp.running_status = 0
+                    self._forward(inp, b, pos, 1, True)
+                    self._start_sysex(inp)
+                    pos += 1
+                    continue
+                inp.running_status = b if info & CHANNEL_MSG else 0
+                status_byte = b
+                explicit = True
+                msg_end = pos + 1 + (info & DATA_LEN_MASK)
+            else:
+                status_byte = inp.running_status
+                if not status_byte:
+                    # data byte with no status to go with it
+                    self._error_count += 1
+                    self._forward(inp, 0, pos, 1, True)
+                    pos += 1
+                    continue
+                explicit = False
+                msg_end = pos + (_STATUS_INFO[status_byte] & DATA_LEN_MASK)
+
+            if msg_end > end:
+                break  # partial message, finish it on the next read
+
+            # Check the data bytes. A real-time byte among them is moved ahead
+            # of the message, anything else means the message is corrupt.
+            data_start = pos + 1 if explicit else pos
+            for i in range(data_start, msg_end):
+                c = buf[i]
+                if c & 0x80:
+                    if c >= tmidi.CLOCK:
+                        for j in range(i, pos, -1):
+                            buf[j] = buf[j - 1]
+                        buf[pos] = c
+                    else:
+                        self._error_count += 1
+                        self._forward(inp, 0, pos, i - pos, True)
+                        pos = i
+                    break
+            else:
+                if self._sysex_outputs and self._held(inp, status_byte):
+                    break
+                self._forward(inp, status_byte, pos, msg_end - pos, explicit)
+                pos = msg_end
+
+        for route in inp.routes:
+            route.flush(inp, pos)
+        if self._histogram:
+            self._histogram.add(time.monotonic_ns() - read_ns)
+        # keep the partial or held back messages for the next read
+        inp.carry = end - pos
+        for i in range(inp.carry):
+            buf[i] = buf[pos + i]
+        return nbytes
+
+    def _held(self, inp, status_byte):
+        # Whether a message has to wait for another input's SysEx to end on one
+        # of the outputs it goes to. Messages after it wait too, to keep order.
+        for route in inp.routes:
+            sysex_input = route.output.sysex_input
+            if sysex_input and sysex_input is not inp and route.accept[status_byte]:
+                inp.held = True
+                return True
+        return False
+
+    def _start_sysex(self, inp):
+        for route in inp.routes:
+            out = route.output
+            if route.accept[tmidi.SYSEX] and out.sysex_input is None:
+                out.sysex_input = inp
+                self._sysex_outputs += 1
+
+    def _end_sysex(self, inp):
+        for route in inp.routes:
+            out = route.output
+            if out.sysex_input is inp:
+                out.sysex_input = None
+                self._sysex_outputs -= 1
+
+    def _forward(self, inp, status_byte, pos, nbytes, explicit):
+        # Add the message of nbytes at pos to each route's run of bytes to write,
+        # or drop it from routes that don't accept it (status_byte 0 drops always).
+        info = _STATUS_INFO[status_byte]
+        for route in inp.routes:
+            if not route.accept[status_byte]:
+                route.flush(inp, pos)
+                route.run = pos + nbytes
+                continue
+            out = route.output
+            if not info & CHANNEL_MSG:
+                # SysEx and system common messages cancel running status
+                if not info & REALTIME_MSG:
+                    out.status = 0
+                continue
+            new_status = status_byte
+            if route.channel_map:
+                new_status = status_byte & 0xF0 | route.channel_map[status_byte & 0x0F]
+            if explicit:
+                if new_status != status_byte:
+                    if len(inp.routes) == 1:
+                        inp.buf[pos] = new_status
+                    else:
+                        # other routes still need the original status byte
+                        route.flush(inp, pos)
+                        out.write_status(new_status)
+                        route.run = pos + 1
+                out.status = new_status
+            elif new_status != out.status:
+                # running status data, but the output's running status differs
+                route.flush(inp, pos)
+                out.write_status(new_status)
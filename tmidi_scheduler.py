@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_scheduler`
+================================================================================
+
+Timestamped MIDI output scheduler for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+Messages are queued with the ``time.monotonic_ns()`` time they should go out
+at, and kept in a heap ordered by that time. Each ``service()`` call sends
+everything that has come due in one batched ``MIDI.send_many()`` write,
+so output timing doesn't depend on what else the main loop is doing.
+
+"""
+
+import time
+
+from tmidi import _heappop, _heappush
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+
+class Scheduler:
+    """
+    Send MIDI messages at future times.
+
+    :param midi: The ``tmidi.MIDI`` object to send messages with.
+
+    Example of playing an arpeggio with 250 msec gate times:
+
+    .. code-block:: python
+
+        import time
+        import usb_midi
+        import tmidi
+        import tmidi_scheduler
+
+        midi = tmidi.MIDI(midi_out=usb_midi.ports[1])
+        scheduler = tmidi_scheduler.Scheduler(midi)
+        now = time.monotonic_ns()
+        for i, note in enumerate((60, 64, 67, 72)):
+            start = now + i * 250_000_000
+            scheduler.schedule(tmidi.Message(tmidi.NOTE_ON, note, 100), start)
+            scheduler.schedule(tmidi.Message(tmidi.NOTE_OFF, note, 0), start + 200_000_000)
+
+        while scheduler.pending:
+            scheduler.service()
+            print("late by %d usec" % (scheduler.lateness_ns // 1000))
+    """
+
+    def __init__(self, midi):
+        self._midi = midi
+        self._heap = []
+        self._seq = 0  # keeps messages for the same time in the order scheduled
+        self._due = []  # reused list of messages to send in one service()
+        self.lateness_ns = 0
+        """How late, in nanoseconds, the last ``service()`` that sent
+        anything was for its earliest message."""
+        self.max_lateness_ns = 0
+        """The largest ``lateness_ns`` seen, set to 0 to start measuring again."""
+
+    @property
+    def pending(self):
+        """Number of messages waiting to be sent"""
+        return len(self._heap)
+
+    def schedule(self, msg, time_ns):
+        """Queue a message to be sent at a ``time.monotonic_ns()`` time.
+        The message must not be changed until it has been sent.
+
+        :param Message msg: The message to send.
+        :param int time_ns: When to send it, in ``time.monotonic_ns()`` nanoseconds.
+        """
+        _heappush(self._heap, (time_ns, self._seq, msg))
+        self._seq += 1
+
+    def schedule_in(self, msg, delay_ns):
+        """Queue a message to be sent after a delay from now.
+
+        :param Message msg: The message to send.
+        :param int delay_ns: How long from now to send it, in nanoseconds.
+        """
+        self.schedule(msg, time.monotonic_ns() + delay_ns)
+
+    def clear(self):
+        """Drop all the messages waiting to be sent"""
+        self._heap.clear()
+
+    def service(self, now_ns=None):
+        """Send all the messages that are due, in one batched write.
+        Call this often, e.g. every time through the main loop.
+
+        :param int now_ns: The current ``time.monotonic_ns()`` time,
+            default None to read it.
+        :returns int: Number of messages sent.
+        """
+        heap = self._heap
+        if not heap:
+            return 0
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if heap[0][0] > now_ns:
+            return 0
+        lateness = now_ns - heap[0][0]
+        due = self._due
+        while heap and heap[0][0] <= now_ns:
+            due.append(_heappop(heap)[2])
+        self._midi.send_many(due)
+        count = len(due)
+        due.clear()
+        self.lateness_ns = lateness
+        self.max_lateness_ns = max(self.max_lateness_ns, lateness)
+        return count
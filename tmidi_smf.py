@@ -0,0 +1,845 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_smf`
+================================================================================
+
+Standard MIDI File (SMF) support for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+Files are read lazily, straight from a file object or from a buffer like an
+``mmap``, so files of many megabytes play in constant memory. Each track has
+a cursor with a small read buffer and at most one decoded event waiting,
+and format 1 tracks are merged into time order with a heap of those cursors.
+Recording goes the other way, through one fixed-size buffer written out
+whole, with the track's length filled in at the end.
+
+"""
+
+import time
+from array import array
+
+from micropython import const
+
+import tmidi
+from tmidi import CHANNEL_MSG, DATA_LEN_MASK, _STATUS_INFO, _heappop, _heappush
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+# Meta event types
+META_TRACK_NAME = const(0x03)
+"""Meta event type of a track name"""
+META_END_OF_TRACK = const(0x2F)
+"""Meta event type marking the end of a track"""
+META_TEMPO = const(0x51)
+"""Meta event type of a tempo change, 3 bytes of microseconds per beat"""
+META_TIME_SIGNATURE = const(0x58)
+"""Meta event type of a time signature: numerator, denominator as a power of 2,
+MIDI clocks per metronome click and 32nd notes per beat"""
+
+_META = const(0xFF)
+_SYSEX_ESCAPE = const(0xF7)
+
+# Microsecond times overflow 32 bit ints after 35 minutes, so the tempo map
+# keeps them in 64 bit ints, or in a list where array has no 64 bit type
+try:
+    _US_TYPECODE = "q"
+    array(_US_TYPECODE)
+except ValueError:
+    _US_TYPECODE = None
+
+# What a track cursor has waiting
+_EVENT_MIDI = const(1)
+_EVENT_META = const(2)
+
+
+class _Track:
+    # Cursor reading the events of one track chunk
+    def __init__(self, source, start, length, buf_size):
+        self.source = source
+        self.end = start + length
+        self.pos = start  # file offset of the next byte to decode
+        if hasattr(source, "readinto"):
+            self.buf = bytearray(buf_size)
+            self.buf_start = 0  # file offset of buf[0]
+            self.buf_len = 0
+        else:
+            # a buffer holding the whole file needs no reads
+            self.buf = source
+            self.buf_start = 0
+            self.buf_len = len(source)
+        self.tick = 0
+        self.running_status = 0
+        # where the last advance() started, to restart from there after a seek
+        self.start_pos = start
+        self.start_tick = 0
+        self.start_status = 0
+        self.event = 0  # what the last advance() found
+        self.status = 0
+        self.data0 = 0
+        self.data1 = 0
+        self.meta_type = 0
+        self.meta_data = None
+        self.errors = 0
+
+    def byte(self):
+        # The next byte of the track, or -1 at the end of it
+        if self.pos >= self.end:
+            return -1
+        i = self.pos - self.buf_start
+        if i < 0 or i >= self.buf_len:
+            self.source.seek(self.pos)
+            self.buf_start = self.pos
+            self.buf_len = self.source.readinto(self.buf) or 0
+            if not self.buf_len:
+                # the file is shorter than its track header said
+                self.end = self.pos
+                self.errors += 1
+                return -1
+            i = 0
+        self.pos += 1
+        return self.buf[i]
+
+    def varlen(self):
+        # A variable-length quantity, 7 bits per byte, high bit set on all
+        # but the last byte. At most 4 bytes long.
+        value = 0
+        for _ in range(4):
+            b = self.byte()
+            if b < 0:
+                return -1
+            value = (value << 7) | (b & 0x7F)
+            if not b & 0x80:
+                return value
+        self.errors += 1
+        return -1
+
+    def restore(self, pos, tick, running_status):
+        # Go back to where an earlier advance() started
+        self.pos = pos
+        self.tick = tick
+        self.running_status = running_status
+
+    def advance(self, midi, meta_types):
+        # Decode up to the next MIDI event if midi is set, or meta event of a
+        # type in meta_types. Returns what was found, or 0 at the end of the track.
+        self.start_pos = self.pos
+        self.start_tick = self.tick
+        self.start_status = self.running_status
+        self.event = self._advance(midi, meta_types)
+        return self.event
+
+    def _advance(self, midi, meta_types):
+        while True:
+            delta = self.varlen()
+            if delta < 0:
+                return 0
+            self.tick += delta
+            b = self.byte()
+            if b < 0:
+                return 0
+            if b == _META:
+                meta_type = self.byte()
+                length = self.varlen()
+                if length < 0 or meta_type == META_END_OF_TRACK:
+                    return 0
+                if meta_type in meta_types:
+                    data = bytearray(length)
+                    for i in range(length):
+                        b = self.byte()
+                        if b < 0:
+                            return 0
+                        data[i] = b
+                    self.meta_type = meta_type
+                    self.meta_data = bytes(data)
+                    return _EVENT_META
+                self.pos += length
+                continue
+            if b in (tmidi.SYSEX, _SYSEX_ESCAPE):
+                # SysEx isn't handed out, skip its length-prefixed payload
+                length = self.varlen()
+                if length < 0:
+                    return 0
+                self.pos += length
+                continue
+            if b & 0x80:
+                if not _STATUS_INFO[b] & CHANNEL_MSG:
+                    # system common and real-time bytes aren't valid in files
+                    self.errors += 1
+                    self.end = self.pos
+                    return 0
+                self.running_status = b
+                data_len = _STATUS_INFO[b] & DATA_LEN_MASK
+                self.data0 = self.byte()
+            elif self.running_status:
+                data_len = _STATUS_INFO[self.running_status] & DATA_LEN_MASK
+                self.data0 = b
+            else:
+                # data byte with no status to go with it
+                self.errors += 1
+                self.end = self.pos
+                return 0
+            self.status = self.running_status
+            self.data1 = self.byte() if data_len == 2 else 0
+            if self.data0 < 0 or self.data1 < 0:
+                return 0
+            if midi:
+                return _EVENT_MIDI
+
+
+class Reader:
+    """
+    Lazy reader of Standard MIDI Files, format 0 and format 1.
+    Only the file's header and the positions of its tracks are read when
+    a Reader is made, events are read as they're iterated over.
+
+    :param source: The file, either a file object opened in binary mode which
+        implements ``seek()`` and ``readinto()``, or a buffer holding the whole
+        file, like an ``mmap.mmap``, ``bytes`` or ``memoryview``.
+    :param int buf_size: Size of the read buffer each track gets while
+        iterating a file object, default 32.
+
+    Example of printing the messages in a file:
+
+    .. code-block:: python
+
+        import tmidi_smf
+
+        with open("/song.mid", "rb") as file:
+            reader = tmidi_smf.Reader(file)
+            for msg in reader.events():
+                print(msg.time, msg)
+    """
+
+    def __init__(self, source, buf_size=32):
+        self._source = source
+        self._buf_size = buf_size
+        self._tracks = []  # (start, length) of each track chunk
+        self._error_count = 0
+
+        header = self._read(0, 14)
+        if len(header) < 14 or header[:4] != b"MThd":
+            raise ValueError("Not a Standard MIDI File")
+        header_len = int.from_bytes(header[4:8], "big")
+        self.format = int.from_bytes(header[8:10], "big")
+        """The file's format: 0 for a single track, 1 for tracks played together,
+        2 for independent tracks."""
+        num_tracks = int.from_bytes(header[10:12], "big")
+        self.division = int.from_bytes(header[12:14], "big")
+        """Ticks per beat (quarter note), or if the high bit is set,
+        SMPTE frames per second and ticks per frame."""
+
+        pos = 8 + header_len
+        while len(self._tracks) < num_tracks:
+            chunk = self._read(pos, 8)
+            if len(chunk) < 8:
+                self._error_count += 1  # fewer tracks than the header said
+                break
+            length = int.from_bytes(chunk[4:8], "big")
+            if chunk[:4] == b"MTrk":
+                self._tracks.append((pos + 8, length))
+            pos += 8 + length
+
+    @property
+    def num_tracks(self):
+        """Number of tracks in the file"""
+        return len(self._tracks)
+
+    @property
+    def error_count(self):
+        """Number of errors found by the iterations over the file that have
+        finished, such as tracks cut short or bytes that aren't valid in a MIDI
+        file. Reading stops at an error in a track, but goes on with the others."""
+        return self._error_count
+
+    def events(self, track=None, msg=None):
+        """Generator of the MIDI messages in the file, in time order.
+        Each message's ``time`` is its time in ticks from the start of the file.
+        Meta events and SysEx are skipped, see ``meta_events()``.
+
+        :param int track: Read only this track, default None, which merges
+            all the tracks of a format 0 or format 1 file.
+        :param Message msg: If set, this Message is filled in and yielded
+            for every event, instead of allocating new ones.
+        """
+        for cursor in self._merge(self._cursors(track), True, ()):
+            if msg is None:
+                yield self._message(tmidi.Message(), cursor)
+            else:
+                yield self._message(msg, cursor)
+
+    def meta_events(self, meta_types, track=None):
+        """Generator of the meta events of some types in the file, in time order.
+
+        :param meta_types: A sequence of meta event types, e.g. ``(META_TEMPO,)``.
+        :param int track: Read only this track, default None for all tracks.
+        :returns: A generator of ``(tick, meta_type, data)`` tuples,
+            ``data`` being the event's ``bytes``.
+        """
+        for cursor in self._merge(self._cursors(track), False, meta_types):
+            yield cursor.tick, cursor.meta_type, cursor.meta_data
+
+    def _cursors(self, track=None):
+        # A cursor at the start of each track, or of just one track
+        if track is None:
+            tracks = self._tracks
+        else:
+            tracks = (self._tracks[track],)
+        return [
+            _Track(self._source, start, length, self._buf_size)
+            for start, length in tracks
+        ]
+
+    def _merge(self, cursors, midi, meta_types):
+        # Yield track cursors as their events come due, merging tracks in
+        # tick order with a heap. Events at the same tick go in track order.
+        heap = []
+        for i, cursor in enumerate(cursors):
+            if cursor.advance(midi, meta_types):
+                _heappush(heap, (cursor.tick, i))
+        try:
+            while heap:
+                i = _heappop(heap)[1]
+                cursor = cursors[i]
+                yield cursor
+                if cursor.advance(midi, meta_types):
+                    _heappush(heap, (cursor.tick, i))
+        finally:
+            for cursor in cursors:
+                self._error_count += cursor.errors
+                cursor.errors = 0
+
+    def _read(self, pos, nbytes):
+        if hasattr(self._source, "readinto"):
+            self._source.seek(pos)
+            return self._source.read(nbytes)
+        return bytes(self._source[pos : pos + nbytes])
+
+    @staticmethod
+    def _message(msg, cursor):
+        status_byte = cursor.status
+        msg.type = status_byte & 0xF0
+        msg.channel = status_byte & 0x0F
+        msg.data0 = cursor.data0
+        msg.data1 = cursor.data1
+        msg.time = cursor.tick
+        return msg
+
+
+def _bisect(values, x):
+    # Index of the last of the ascending values that is <= x, or -1 if none are
+    lo = 0
+    hi = len(values)
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if values[mid] <= x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo - 1
+
+
+class Player:
+    """
+    Play a Standard MIDI File out to a ``tmidi.MIDI`` output.
+
+    The file is read through once when the Player is made, to build a tempo map
+    of where each tempo change falls in time, a map of the bars, and an index of
+    where each track is every ``index_ticks``. Seeking is then a binary search
+    and a short read, and each event's time comes straight from the tempo map,
+    so long playback and loops don't drift.
+
+    :param Reader reader: The file to play.
+    :param midi: The ``tmidi.MIDI`` object to send messages with.
+    :param int index_ticks: How often, in ticks, to note where each track is,
+        default 0 for every 4 beats. Smaller makes seeking faster, but the index
+        bigger. Each index entry holds three ints per track.
+    :param int batch_size: Most messages to send in one ``send_many()``, default 16.
+
+    Example of looping the first 8 bars of a file:
+
+    .. code-block:: python
+
+        import usb_midi
+        import tmidi
+        import tmidi_smf
+
+        midi = tmidi.MIDI(midi_out=usb_midi.ports[1])
+        with open("/backing.mid", "rb") as file:
+            player = tmidi_smf.Player(tmidi_smf.Reader(file), midi)
+            player.set_loop(0, player.bar_to_tick(8))
+            player.play()
+            while player.playing:
+                player.service()
+    """
+
+    def __init__(self, reader, midi, index_ticks=0, batch_size=16):
+        self._reader = reader
+        self._midi = midi
+        self._division = reader.division
+        self._batch = [tmidi.Message() for _ in range(batch_size)]
+        self._due = []  # reused list of messages to send in one service()
+        tempo = 500_000
+        if self._division & 0x8000:
+            # SMPTE time: frames per second (negative) and ticks per frame
+            self._division = (256 - (self._division >> 8)) * (self._division & 0xFF)
+            tempo = 1_000_000
+        # tempo map: each tempo's start tick, start microseconds, and
+        # microseconds per beat (or per division ticks with SMPTE time)
+        self._tempo_ticks = array("l", (0,))
+        self._tempo_us = array(_US_TYPECODE, (0,)) if _US_TYPECODE else [0]
+        self._tempos = array("l", (tempo,))
+        # bar map: each time signature's start tick, first bar, ticks per bar
+        self._sig_ticks = array("l", (0,))
+        self._sig_bars = array("l", (0,))
+        self._sig_lens = array("l", (4 * self._division,))
+        # index of each track's position, every index_ticks
+        self._index_ticks = array("l")
+        self._index = array("l")  # start pos, tick and running status per track
+        self._channels = 0  # bit mask of the channels with notes
+        self._build_index(index_ticks or 4 * self._division)
+        self.length_ticks = self._length
+        """Length of the file, in ticks"""
+
+        self._speed = 65536  # 16.16 fixed point
+        self._loop_start = 0
+        self._loop_end = -1
+        self._playing = False
+        self._events = None
+        self._next = None
+        self._tempo = 0  # index of the tempo map entry of the next event
+        # the time in the file, at the monotonic_ns() time of anchor_ns
+        self._anchor_ns = 0
+        self._anchor_us = 0
+        self.seek(0)
+
+    def _build_index(self, index_ticks):
+        smpte = self._reader.division & 0x8000  # SMPTE time has no tempo
+        cursors = self._reader._cursors()  # pylint: disable=protected-access
+        # pylint: disable-next=protected-access
+        events = self._reader._merge(cursors, True, (META_TEMPO, META_TIME_SIGNATURE))
+        next_index = index_ticks
+        self._length = 0
+        for cursor in events:
+            tick = cursor.tick
+            if tick >= next_index:
+                # all the events before tick have gone by, note where each track is
+                self._index_ticks.append(tick)
+                for each in cursors:
+                    self._index.append(each.start_pos)
+                    self._index.append(each.start_tick)
+                    self._index.append(each.start_status)
+                next_index = (tick // index_ticks + 1) * index_ticks
+            if cursor.event == _EVENT_MIDI:
+                if cursor.status & 0xF0 == tmidi.NOTE_ON:
+                    self._channels |= 1 << (cursor.status & 0x0F)
+            elif cursor.meta_type == META_TEMPO and not smpte:
+                data = cursor.meta_data
+                if len(data) == 3:
+                    self._add_map_entry(
+                        tick,
+                        (self._tempo_ticks, tick),
+                        (self._tempo_us, self.tick_to_us(tick)),
+                        (self._tempos, data[0] << 16 | data[1] << 8 | data[2]),
+                    )
+            elif cursor.meta_type == META_TIME_SIGNATURE:
+                data = cursor.meta_data
+                if len(data) >= 2:
+                    i = len(self._sig_ticks) - 1
+                    bar = self._sig_bars[i] + -(
+                        (self._sig_ticks[i] - tick) // self._sig_lens[i]
+                    )
+                    self._add_map_entry(
+                        tick,
+                        (self._sig_ticks, tick),
+                        (self._sig_bars, bar),
+                        (self._sig_lens, 4 * self._division * data[0] >> data[1]),
+                    )
+        for cursor in cursors:
+            self._length = max(self._length, cursor.tick)
+
+    @staticmethod
+    def _add_map_entry(tick, *columns):
+        # Append a row to a map, or replace its last row if that's at the same tick
+        replace = columns[0][0][-1] == tick
+        for column, value in columns:
+            if replace:
+                column[-1] = value
+            else:
+                column.append(value)
+
+    @property
+    def playing(self):
+        """True while playing, False when stopped or past the end"""
+        return self._playing
+
+    @property
+    def speed(self):
+        """How fast to play, relative to the file's tempo, default 1.0.
+        Can be changed while playing."""
+        return self._speed / 65536
+
+    @speed.setter
+    def speed(self, speed):
+        # carry on from the position now, at the new speed
+        if self._playing:
+            now_ns = time.monotonic_ns()
+            self._anchor_us = self._us_at(now_ns)
+            self._anchor_ns = now_ns
+        self._speed = max(1, int(speed * 65536))
+
+    @property
+    def position(self):
+        """The current position in the file, in ticks"""
+        if self._playing:
+            return self.us_to_tick(self._us_at(time.monotonic_ns()))
+        return self.us_to_tick(self._anchor_us)
+
+    def tick_to_us(self, tick):
+        """The time of a tick from the start of the file, in microseconds,
+        at the file's tempo.
+
+        :param int tick: The time in ticks.
+        """
+        i = _bisect(self._tempo_ticks, tick)
+        # rounded up, so us_to_tick() gives the tick back
+        return self._tempo_us[i] - (
+            (self._tempo_ticks[i] - tick) * self._tempos[i] // self._division
+        )
+
+    def us_to_tick(self, us):
+        """The tick at a time from the start of the file, at the file's tempo.
+
+        :param int us: The time in microseconds.
+        """
+        i = _bisect(self._tempo_us, us)
+        return self._tempo_ticks[i] + (
+            (us - self._tempo_us[i]) * self._division // self._tempos[i]
+        )
+
+    def bar_to_tick(self, bar):
+        """The tick a bar starts at, following the file's time signatures.
+
+        :param int bar: The bar number, counting from 0.
+        """
+        i = _bisect(self._sig_bars, bar)
+        return self._sig_ticks[i] + (bar - self._sig_bars[i]) * self._sig_lens[i]
+
+    def set_loop(self, start_tick=0, end_tick=None):
+        """Loop a part of the file until ``clear_loop()``.
+
+        :param int start_tick: Where the loop starts, in ticks, default 0.
+        :param int end_tick: Where the loop ends, in ticks, default None
+            for the end of the file.
+        """
+        if end_tick is None:
+            end_tick = self.length_ticks
+        if end_tick <= start_tick:
+            raise ValueError("Loop must end after it starts")
+        self._loop_start = start_tick
+        self._loop_end = end_tick
+
+    def clear_loop(self):
+        """Stop looping, playing on to the end of the file."""
+        self._loop_end = -1
+
+    def seek(self, tick):
+        """Move to a position in the file. Messages before it aren't sent.
+
+        :param int tick: The position, in ticks. Use ``us_to_tick()`` or
+            ``bar_to_tick()`` to seek to a time or bar.
+        """
+        reader = self._reader
+        cursors = reader._cursors()  # pylint: disable=protected-access
+        i = _bisect(self._index_ticks, tick)
+        if i >= 0:
+            pos = i * 3 * len(cursors)
+            for cursor in cursors:
+                cursor.restore(
+                    self._index[pos], self._index[pos + 1], self._index[pos + 2]
+                )
+                pos += 3
+        if self._events:
+            self._events.close()
+        # pylint: disable-next=protected-access
+        self._events = reader._merge(cursors, True, ())
+        self._next = next(self._events, None)
+        while self._next and self._next.tick < tick:
+            self._next = next(self._events, None)
+        self._tempo = max(0, _bisect(self._tempo_ticks, tick))
+        self._anchor_us = self.tick_to_us(tick)
+        if self._playing:
+            self._anchor_ns = time.monotonic_ns()
+
+    def play(self, now_ns=None):
+        """Start or resume playing from the current position.
+
+        :param int now_ns: The ``time.monotonic_ns()`` time to start at,
+            default None to read it.
+        """
+        self._anchor_ns = time.monotonic_ns() if now_ns is None else now_ns
+        self._playing = True
+
+    def stop(self):
+        """Stop playing, and turn off the notes on the channels the file uses.
+        ``play()`` resumes from where it stopped."""
+        if self._playing:
+            self._anchor_us = self._us_at(time.monotonic_ns())
+            self._playing = False
+        self._notes_off()
+
+    def service(self, now_ns=None):
+        """Send all the messages that are due, in batched writes.
+        Call this often, e.g. every time through the main loop.
+
+        :param int now_ns: The current ``time.monotonic_ns()`` time,
+            default None to read it.
+        :returns int: Number of messages sent.
+        """
+        if not self._playing:
+            return 0
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        batch = self._batch
+        due = self._due
+        count = 0
+        while True:
+            cursor = self._next
+            loop_end = self._loop_end
+            if cursor is None or 0 <= loop_end <= cursor.tick:
+                end_tick = loop_end if loop_end >= 0 else self.length_ticks
+                end_ns = self._ns_at(self.tick_to_us(end_tick))
+                if end_ns > now_ns:
+                    break
+                if loop_end < 0:
+                    self._playing = False
+                    self._anchor_us = self.tick_to_us(end_tick)
+                    break
+                # loop around, timed from the loop end so loops don't drift
+                self._send(due)
+                self._notes_off()
+                self._playing = False
+                self.seek(self._loop_start)
+                self._anchor_ns = end_ns
+                self._playing = True
+                continue
+            # the tempo map entry for this event, events come in tick order
+            tempo_ticks = self._tempo_ticks
+            i = self._tempo
+            while i + 1 < len(tempo_ticks) and tempo_ticks[i + 1] <= cursor.tick:
+                i += 1
+            self._tempo = i
+            event_us = self._tempo_us[i] - (
+                (tempo_ticks[i] - cursor.tick) * self._tempos[i] // self._division
+            )
+            if self._ns_at(event_us) > now_ns:
+                break
+            # pylint: disable-next=protected-access
+            due.append(Reader._message(batch[len(due)], cursor))
+            count += 1
+            if len(due) == len(batch):
+                self._send(due)
+            self._next = next(self._events, None)
+        self._send(due)
+        return count
+
+    def _send(self, due):
+        if due:
+            self._midi.send_many(due)
+            due.clear()
+
+    def _notes_off(self):
+        # All Notes Off on each channel the file plays notes on
+        channels = self._channels
+        msgs = [
+            tmidi.Message(tmidi.CC, 123, 0, channel=channel)
+            for channel in range(16)
+            if channels >> channel & 1
+        ]
+        if msgs:
+            self._midi.send_many(msgs)
+
+    def _ns_at(self, us):
+        # The monotonic_ns() time of a time in the file
+        if self._speed == 65536:
+            return self._anchor_ns + (us - self._anchor_us) * 1000
+        return self._anchor_ns + (us - self._anchor_us) * 1000 * 65536 // self._speed
+
+    def _us_at(self, now_ns):
+        # The time in the file at a monotonic_ns() time
+        return self._anchor_us + (now_ns - self._anchor_ns) * self._speed // 65536000
+
+
+class Recorder:
+    """
+    Record MIDI messages into a format 0 Standard MIDI File as they're received,
+    using a fixed amount of memory however long the recording goes on.
+    Messages are encoded into a staging buffer, written out to the file
+    a whole buffer at a time, at file offsets that are multiples of its size,
+    and the track's length is filled in by ``close()``.
+
+    :param file: The file to write, opened in binary mode, e.g. ``open(path, "wb")``.
+        It must implement ``seek()`` for ``close()``. It is left open.
+    :param int division: Ticks per beat, default 480.
+    :param int tempo: Tempo to write into the file, in microseconds per beat,
+        default 500_000 (120 BPM). With ``division``, this sets how finely times
+        are recorded, about 1 msec by default.
+    :param int buf_size: Size of the staging buffer and of each write, default 512,
+        which suits flash and SD card blocks.
+    :param int start_ns: The ``time.monotonic_ns()`` time the recording starts at,
+        default None for now.
+
+    Message times come from ``Message.time``, so make the ``tmidi.MIDI`` object
+    with ``timestamps=True``. Messages without a time are recorded at the time
+    they're passed to ``record()``. Real-time and system common messages
+    aren't recorded, as they can't be stored in a MIDI file.
+
+    Example of recording everything received on USB MIDI until BOOT is pressed:
+
+    .. code-block:: python
+
+        import board
+        import digitalio
+        import usb_midi
+        import tmidi
+        import tmidi_smf
+
+        button = digitalio.DigitalInOut(board.BUTTON)
+        button.pull = digitalio.Pull.UP
+        midi = tmidi.MIDI(
+            midi_in=usb_midi.ports[0], sysex_buf=bytearray(64), timestamps=True
+        )
+        with open("/take1.mid", "wb") as file:
+            with tmidi_smf.Recorder(file) as recorder:
+                while button.value:
+                    if msg := midi.receive():
+                        recorder.record(msg, midi.sysex_data, midi.sysex_complete)
+    """
+
+    def __init__(self, file, division=480, tempo=500_000, buf_size=512, start_ns=None):
+        self._file = file
+        self._ns_per_beat = tempo * 1000
+        self._division = division
+        self._start_ns = time.monotonic_ns() if start_ns is None else start_ns
+        self._buf = bytearray(max(buf_size, 32))
+        self._pos = 0
+        self._event = bytearray(8)  # one encoded channel message
+        self._tick = 0
+        self._status = 0  # running status written
+        self._in_sysex = False  # a SysEx is recorded in chunks, more to come
+        self._flushed = 0  # bytes of the file written out so far
+        self.message_count = 0
+        """Number of messages recorded"""
+        self._put_bytes(b"MThd\x00\x00\x00\x06\x00\x00\x00\x01")
+        self._put_bytes(division.to_bytes(2, "big"))
+        self._put_bytes(b"MTrk\x00\x00\x00\x00")  # length filled in by close()
+        self._put_bytes(b"\x00\xff\x51\x03")
+        self._put_bytes(tempo.to_bytes(3, "big"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, msg, data=None, complete=True):
+        """Add a message to the recording.
+
+        :param Message msg: The message, e.g. from ``MIDI.receive()``.
+        :param data: For a SYSEX message, its payload, e.g. ``MIDI.sysex_data``,
+            default None, which skips SysEx.
+        :param bool complete: For a SYSEX message, whether ``data`` is the end
+            of the SysEx, e.g. ``MIDI.sysex_complete``, default True. A SysEx
+            received in chunks is recorded as one SysEx, the chunks after
+            the first as SysEx continuation events.
+        """
+        mtype = msg.type
+        if mtype < tmidi.SYSEX:
+            status_byte = mtype | msg.channel
+        elif mtype == tmidi.SYSEX and data is not None:
+            status_byte = mtype
+        else:
+            return
+        msg_ns = msg.time or time.monotonic_ns()
+        tick = (msg_ns - self._start_ns) * self._division // self._ns_per_beat
+        event = self._event
+        nbytes = self._encode_varlen(event, max(0, tick - self._tick))
+        self._tick = max(tick, self._tick)
+        if status_byte == tmidi.SYSEX:
+            # SysEx cancels running status
+            self._status = 0
+            continued = self._in_sysex
+            event[nbytes] = _SYSEX_ESCAPE if continued else tmidi.SYSEX
+            nbytes = self._encode_varlen(
+                event, len(data) + (1 if complete else 0), nbytes + 1
+            )
+            self._put_bytes(event, nbytes)
+            self._put_bytes(data)
+            if complete:
+                event[0] = tmidi.SYSEX_END
+                self._put_bytes(event, 1)
+            self._in_sysex = not complete
+            if continued:
+                return  # counted with its first chunk
+        else:
+            self._in_sysex = False
+            if status_byte != self._status:
+                self._status = status_byte
+                event[nbytes] = status_byte
+                nbytes += 1
+            data_len = _STATUS_INFO[status_byte] & DATA_LEN_MASK
+            event[nbytes] = msg.data0
+            if data_len == 2:
+                event[nbytes + 1] = msg.data1
+            self._put_bytes(event, nbytes + data_len)
+        self.message_count += 1
+
+    def close(self):
+        """End the track, write out the rest of the buffer, and fill in
+        the track's length. The file is left open."""
+        if self._buf is None:
+            return
+        self._put_bytes(b"\x00\xff\x2f\x00")  # end of track
+        file = self._file
+        if self._pos:
+            file.write(memoryview(self._buf)[: self._pos])
+        end = self._flushed + self._pos
+        file.seek(18)  # the MTrk chunk's length
+        file.write((end - 22).to_bytes(4, "big"))
+        file.seek(end)
+        self._buf = None
+
+    @staticmethod
+    def _encode_varlen(buf, value, offset=0):
+        # Encode value as a variable-length quantity at offset in buf,
+        # returns the offset after it
+        shift = 21
+        while shift and not value >> shift:
+            shift -= 7
+        while shift:
+            buf[offset] = 0x80 | (value >> shift) & 0x7F
+            offset += 1
+            shift -= 7
+        buf[offset] = value & 0x7F
+        return offset + 1
+
+    def _put_bytes(self, data, nbytes=None):
+        # Copy bytes into the staging buffer, writing it out each time it fills
+        buf = self._buf
+        size = len(buf)
+        pos = self._pos
+        for i in range(len(data) if nbytes is None else nbytes):
+            buf[pos] = data[i]
+            pos += 1
+            if pos == size:
+                self._file.write(buf)
+                self._flushed += size
+                pos = 0
+        self._pos = pos
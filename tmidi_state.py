@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_state`
+================================================================================
+
+Channel and note state tracking for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+A Tracker keeps what's known about each channel in fixed tables, filled in
+from received messages: a 16 x 128 ``bytearray`` each of note velocities and
+controller values, a bitset of the held notes for iterating over them
+quickly, and per-channel pitch bend, program and channel pressure.
+Every update and lookup is a single index, whatever is being held.
+
+"""
+
+from array import array
+
+import tmidi
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+# Controllers that turn notes off
+_ALL_SOUND_OFF = 120
+_ALL_NOTES_OFF = 123
+
+
+class Tracker:
+    """
+    Track held notes and controller state from received MIDI messages.
+
+    Example of printing the held notes as they change:
+
+    .. code-block:: python
+
+        import usb_midi
+        import tmidi
+        import tmidi_state
+
+        midi = tmidi.MIDI(midi_in=usb_midi.ports[0], midi_out=usb_midi.ports[1])
+        tracker = tmidi_state.Tracker()
+        while True:
+            if msg := midi.receive():
+                tracker.update(msg)
+                if msg.type in (tmidi.NOTE_ON, tmidi.NOTE_OFF):
+                    print("held:", list(tracker.held_notes()))
+    """
+
+    def __init__(self):
+        self.velocities = bytearray(16 * 128)
+        """Velocity of each held note, 0 if not held,
+        indexed by ``channel * 128 + note``"""
+        self.controls = bytearray(16 * 128)
+        """Last value of each controller, indexed by ``channel * 128 + control``"""
+        self.programs = bytearray(16)
+        """Last program change of each channel"""
+        self.pressures = bytearray(16)
+        """Last channel pressure of each channel"""
+        self.pitch_bends = array("h", bytes(32))
+        """Last pitch bend of each channel, -8192 to 8191"""
+        # bit per note, byte channel * 16 + note // 8 holds notes 8 at a time
+        self._held = bytearray(16 * 16)
+        self._held_counts = bytearray(16)  # held notes per channel
+
+    def update(self, msg):
+        """Update the state from a received message. Messages that aren't
+        channel messages are ignored.
+
+        :param Message msg: The message, e.g. from ``MIDI.receive()``.
+        """
+        mtype = msg.type
+        channel = msg.channel
+        if mtype == tmidi.NOTE_ON and msg.data1:
+            i = channel << 7 | msg.data0
+            if not self.velocities[i]:
+                self._held[i >> 3] |= 1 << (i & 7)
+                self._held_counts[channel] += 1
+            self.velocities[i] = msg.data1
+        elif mtype in (tmidi.NOTE_OFF, tmidi.NOTE_ON):
+            i = channel << 7 | msg.data0
+            if self.velocities[i]:
+                self._held[i >> 3] &= ~(1 << (i & 7))
+                self._held_counts[channel] -= 1
+                self.velocities[i] = 0
+        elif mtype == tmidi.CC:
+            self.controls[channel << 7 | msg.data0] = msg.data1
+            if msg.data0 in (_ALL_NOTES_OFF, _ALL_SOUND_OFF):
+                self._clear_notes(channel)
+        elif mtype == tmidi.PITCH_BEND:
+            self.pitch_bends[channel] = (msg.data1 << 7 | msg.data0) - 8192
+        elif mtype == tmidi.PROGRAM_CHANGE:
+            self.programs[channel] = msg.data0
+        elif mtype == tmidi.CHANNEL_PRESSURE:
+            self.pressures[channel] = msg.data0
+
+    def velocity(self, note, channel=0):
+        """Velocity a note is held with, or 0 if it isn't held.
+
+        :param int note: The note number (0-127).
+        :param int channel: The channel (0-15), default 0.
+        """
+        return self.velocities[channel << 7 | note]
+
+    def control(self, control, channel=0):
+        """Last value of a controller.
+
+        :param int control: The controller number (0-127).
+        :param int channel: The channel (0-15), default 0.
+        """
+        return self.controls[channel << 7 | control]
+
+    def held_count(self, channel=None):
+        """Number of notes held.
+
+        :param int channel: The channel (0-15), default None for all channels.
+        """
+        if channel is None:
+            return sum(self._held_counts)
+        return self._held_counts[channel]
+
+    def held_notes(self, channel=None):
+        """Generator of the held note numbers, lowest first.
+
+        :param int channel: The channel (0-15), default None for all channels,
+            in channel order.
+        """
+        channels = range(16) if channel is None else (channel,)
+        held = self._held
+        for each_channel in channels:
+            if not self._held_counts[each_channel]:
+                continue
+            for i in range(each_channel << 4, (each_channel + 1) << 4):
+                bits = held[i]
+                note = (i & 0x0F) << 3
+                while bits:
+                    if bits & 1:
+                        yield note
+                    bits >>= 1
+                    note += 1
+
+    def all_notes_off(self, midi, channel=None):
+        """Send a Note Off for each held note, all in one ``send_many()``,
+        and forget them.
+
+        :param midi: The ``tmidi.MIDI`` object to send with.
+        :param int channel: The channel (0-15), default None for all channels.
+        :returns int: Number of Note Offs sent.
+        """
+        channels = range(16) if channel is None else (channel,)
+        msgs = []
+        for each_channel in channels:
+            for note in self.held_notes(each_channel):
+                msgs.append(tmidi.Message(tmidi.NOTE_OFF, note, 0, each_channel))
+            self._clear_notes(each_channel)
+        if msgs:
+            midi.send_many(msgs)
+        return len(msgs)
+
+    def reset(self):
+        """Forget all the state, as if no messages had been received."""
+        for table in (self.velocities, self.controls, self._held):
+            table[:] = bytes(len(table))
+        for i in range(16):
+            self.programs[i] = 0
+            self.pressures[i] = 0
+            self.pitch_bends[i] = 0
+            self._held_counts[i] = 0
+
+    def _clear_notes(self, channel):
+        if not self._held_counts[channel]:
+            return
+        start = channel << 7
+        self.velocities[start : start + 128] = bytes(128)
+        self._held[channel << 4 : (channel + 1) << 4] = bytes(16)
+        self._held_counts[channel] = 0
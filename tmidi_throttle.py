@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_throttle`
+================================================================================
+
+Output coalescing and rate limiting for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+Controller changes, pitch bend and aftertouch are held back in a slot per
+(channel, controller), (channel, note) or channel, and only the latest value
+of each slot goes out. Slots waiting to be sent are queued in the order they
+were first changed. ``service()`` sends them as a bandwidth budget allows,
+while notes, real-time and all other messages are sent at once, ahead of them,
+so a flood of controller changes can't hold notes up.
+
+"""
+
+import time
+from array import array
+
+from micropython import const
+
+import tmidi
+from tmidi import DATA_LEN_MASK, _STATUS_INFO
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+# Slot numbers: CCs, then polyphonic aftertouch, pitch bend and channel pressure
+_POLY_SLOTS = const(2048)
+_BEND_SLOTS = const(4096)
+_PRESSURE_SLOTS = const(4112)
+_NUM_SLOTS = const(4128)
+
+_NS_PER_SEC = const(1_000_000_000)
+
+# Controllers where every value and their order matter: bank select,
+# data entry, sustain, portamento, sostenuto and soft pedals, (N)RPN,
+# and the channel mode messages, like all notes off
+_IMMEDIATE_CCS = (
+    0, 6, 32, 38, 64, 65, 66, 67, 96, 97, 98, 99, 100, 101,
+    120, 121, 122, 123, 124, 125, 126, 127,
+)  # fmt: skip
+
+
+class Throttle:
+    """
+    Send MIDI through a bandwidth budget, merging controller floods.
+
+    :param midi: The ``tmidi.MIDI`` object to send messages with.
+    :param int bytes_per_sec: Bandwidth budget, default 3125,
+        which is all of 31250 baud DIN MIDI. Notes and other messages sent
+        at once use it up too, leaving less for the controller changes.
+    :param int interval_ns: Least time between sending controller changes,
+        default 0 for every ``service()`` the budget allows.
+    :param int burst: Most bytes of budget saved up while idle, default 32.
+    :param int max_pending: Most slots that can be waiting, default 128.
+        When more change, the oldest waiting is sent at once, over budget.
+    :param immediate_ccs: Controllers that are never merged or held back,
+        default bank select, data entry, pedals, (N)RPN numbers
+        and channel mode messages (controllers 120-127).
+    :param int batch_size: Most messages to send in one ``send_many()``, default 16.
+
+    Example of sending a touch strip as pitch bend without delaying notes:
+
+    .. code-block:: python
+
+        import busio
+        import board
+        import tmidi
+        import tmidi_throttle
+
+        uart = busio.UART(tx=board.TX, baudrate=31250)
+        midi = tmidi.MIDI(midi_out=uart)
+        throttle = tmidi_throttle.Throttle(midi, interval_ns=5_000_000)
+        while True:
+            throttle.send(tmidi.Message(tmidi.PITCH_BEND, read_strip()))
+            if button_pressed():
+                throttle.send(tmidi.Message(tmidi.NOTE_ON, 60, 100))
+            throttle.service()
+    """
+
+    def __init__(
+        self,
+        midi,
+        bytes_per_sec=3125,
+        interval_ns=0,
+        burst=32,
+        max_pending=128,
+        immediate_ccs=_IMMEDIATE_CCS,
+        batch_size=16,
+    ):
+        self._midi = midi
+        self._bytes_per_sec = bytes_per_sec
+        self._interval_ns = interval_ns
+        # the budget is counted in bytes * 1e9, so nanoseconds add up exactly
+        self._max_tokens = burst * _NS_PER_SEC
+        self._tokens = self._max_tokens
+        self._last_ns = None
+        self._flush_ns = None
+        self._values = bytearray(_NUM_SLOTS)
+        self._bend_lsbs = bytearray(16)
+        self._waiting = bytearray(_NUM_SLOTS // 8)  # bit per slot in the queue
+        self._queue = array("H", bytes(2 * max(1, max_pending)))
+        self._queue_start = 0
+        self._queue_len = 0
+        self._immediate = bytearray(128)
+        for control in immediate_ccs:
+            self._immediate[control] = 1
+        self._batch = [tmidi.Message() for _ in range(batch_size)]
+        self._due = []  # reused list of messages to send in one write
+        self.coalesced = 0
+        """Number of controller values replaced by a newer one before being sent"""
+
+    @property
+    def pending(self):
+        """Number of slots waiting to be sent"""
+        return self._queue_len
+
+    def send(self, msg, channel=None):
+        """Send a message. Notes and most messages go out at once, controller
+        changes, pitch bend and aftertouch wait for ``service()``.
+
+        :param Message msg: The message to send. It may be changed or reused
+            once this returns.
+        :param int channel: Channel number, if not set, the msg's channel will be used.
+        """
+        if channel is not None:
+            msg.channel = channel
+        mtype = msg.type
+        if mtype == tmidi.CC and not self._immediate[msg.data0]:
+            slot = msg.channel << 7 | msg.data0
+            value = msg.data1
+        elif mtype == tmidi.PITCH_BEND:
+            slot = _BEND_SLOTS + msg.channel
+            value = msg.data1
+            self._bend_lsbs[msg.channel] = msg.data0
+        elif mtype == tmidi.CHANNEL_PRESSURE:
+            slot = _PRESSURE_SLOTS + msg.channel
+            value = msg.data0
+        elif mtype == tmidi.AFTERTOUCH:
+            slot = _POLY_SLOTS + (msg.channel << 7 | msg.data0)
+            value = msg.data1
+        else:
+            self._midi.send(msg)
+            self._tokens -= (1 + (_STATUS_INFO[mtype] & DATA_LEN_MASK)) * _NS_PER_SEC
+            return
+
+        self._values[slot] = value
+        if self._waiting[slot >> 3] & (1 << (slot & 7)):
+            self.coalesced += 1
+            return
+        if self._queue_len == len(self._queue):
+            self._send_waiting(1, False)
+        self._waiting[slot >> 3] |= 1 << (slot & 7)
+        queue = self._queue
+        queue[(self._queue_start + self._queue_len) % len(queue)] = slot
+        self._queue_len += 1
+
+    def service(self, now_ns=None):
+        """Send the waiting controller changes the budget allows, oldest first,
+        in batched writes. Call this often, e.g. every time through the main loop.
+
+        :param int now_ns: The current ``time.monotonic_ns()`` time,
+            default None to read it.
+        :returns int: Number of messages sent.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if self._last_ns is not None:
+            self._tokens = min(
+                self._max_tokens,
+                self._tokens + (now_ns - self._last_ns) * self._bytes_per_sec,
+            )
+        self._last_ns = now_ns
+        if not self._queue_len:
+            return 0
+        if self._interval_ns and self._flush_ns is not None:
+            if now_ns - self._flush_ns < self._interval_ns:
+                return 0
+        self._flush_ns = now_ns
+        return self._send_waiting(self._queue_len, True)
+
+    def flush(self):
+        """Send all the waiting controller changes now, over budget if need be.
+
+        :returns int: Number of messages sent.
+        """
+        return self._send_waiting(self._queue_len, False)
+
+    def _send_waiting(self, count, budget):
+        # Send up to count waiting slots, oldest first, while the budget lasts
+        queue = self._queue
+        batch = self._batch
+        due = self._due
+        sent = 0
+        while sent < count and self._queue_len:
+            slot = queue[self._queue_start]
+            cost = (2 if slot >= _PRESSURE_SLOTS else 3) * _NS_PER_SEC
+            if budget and self._tokens < cost:
+                break
+            self._tokens -= cost
+            self._queue_start = (self._queue_start + 1) % len(queue)
+            self._queue_len -= 1
+            self._waiting[slot >> 3] &= ~(1 << (slot & 7))
+            due.append(self._message(batch[len(due)], slot))
+            sent += 1
+            if len(due) == len(batch):
+                self._midi.send_many(due)
+                due.clear()
+        if due:
+            self._midi.send_many(due)
+            due.clear()
+        return sent
+
+    def _message(self, msg, slot):
+        # Fill in msg with the latest value of a slot
+        value = self._values[slot]
+        if slot < _POLY_SLOTS:
+            msg.type = tmidi.CC
+            msg.channel = slot >> 7
+            msg.data0 = slot & 0x7F
+            msg.data1 = value
+        elif slot < _BEND_SLOTS:
+            slot -= _POLY_SLOTS
+            msg.type = tmidi.AFTERTOUCH
+            msg.channel = slot >> 7
+            msg.data0 = slot & 0x7F
+            msg.data1 = value
+        elif slot < _PRESSURE_SLOTS:
+            msg.type = tmidi.PITCH_BEND
+            msg.channel = slot - _BEND_SLOTS
+            msg.data0 = self._bend_lsbs[msg.channel]
+            msg.data1 = value
+        else:
+            msg.type = tmidi.CHANNEL_PRESSURE
+            msg.channel = slot - _PRESSURE_SLOTS
+            msg.data0 = value
+            msg.data1 = 0
+        return msg
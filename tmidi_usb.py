@@ -0,0 +1,236 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+#
+# SPDX-License-Identifier: MIT
+"""
+`tmidi_usb`
+================================================================================
+
+USB-MIDI event packet codec for tmidi
+
+
+* Author(s): Tod Kurt
+
+Implementation Notes
+--------------------
+
+USB-MIDI moves MIDI as 4-byte event packets: a header byte holding the
+cable number and Code Index Number (CIN), then up to three MIDI bytes.
+This module decodes whole USB bulk transfers (e.g. from a PIO-USB or
+MAX3421E USB Host MIDI device) straight into ``tmidi.Message`` objects,
+and encodes messages into packets, so one 64-byte transfer carries 16 events.
+
+"""
+
+import tmidi
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/todbot/CircuitPython_TMIDI.git"
+
+# Number of MIDI bytes carried in a packet, indexed by Code Index Number.
+# CIN 0 and 1 are reserved and carry nothing.
+_CIN_LEN = bytes((0, 0, 2, 3, 3, 1, 2, 3, 3, 3, 3, 3, 2, 2, 3, 1))
+
+# Code Index Numbers
+_CIN_SYSEX = 0x4  # SysEx start or continue, 3 bytes
+_CIN_SINGLE = 0x5  # single byte system common or SysEx end with 1 byte
+_CIN_SYSEX_END_3 = 0x7  # SysEx end with 3 bytes
+_CIN_BYTE = 0xF  # single byte
+
+
+def encode(msg, buf, offset=0, cable=0):
+    """Encode a Message into a 4-byte USB-MIDI event packet.
+    Use ``encode_sysex()`` for SysEx.
+
+    :param Message msg: The message to encode.
+    :param buf: A ``bytearray`` with room for four bytes at ``offset``.
+    :param int offset: Position in ``buf`` to write the packet at, default 0.
+    :param int cable: USB-MIDI cable number (0-15), default 0.
+    :returns int: Number of bytes written, always 4.
+    """
+    buf[offset + 2] = 0
+    buf[offset + 3] = 0
+    nbytes = msg.encode_into(buf, offset + 1)
+    status_byte = buf[offset + 1]
+    if status_byte < tmidi.SYSEX:
+        cin = status_byte >> 4
+    elif status_byte >= tmidi.CLOCK:
+        cin = _CIN_BYTE
+    else:
+        # system common messages, by length
+        cin = (_CIN_SINGLE, 0x2, 0x3)[nbytes - 1]
+    buf[offset] = cable << 4 | cin
+    return 4
+
+
+def encode_many(msgs, buf, cable=0):
+    """Encode a sequence of Messages into USB-MIDI event packets,
+    ready to go out in a single USB transfer.
+
+    :param msgs: A sequence (list) of Message objects.
+    :param buf: A ``bytearray`` with room for four bytes per message,
+        e.g. a 64-byte buffer holds 16 messages.
+    :param int cable: USB-MIDI cable number (0-15), default 0.
+    :returns int: Number of bytes written.
+    """
+    pos = 0
+    for msg in msgs:
+        pos += encode(msg, buf, pos, cable)
+    return pos
+
+
+def encode_sysex(data, buf, offset=0, cable=0):
+    """Encode a SysEx message into USB-MIDI event packets.
+
+    :param data: The SysEx payload, not including the SYSEX and SYSEX_END bytes.
+    :param buf: A ``bytearray`` with room for ``4 * ((len(data) + 4) // 3)``
+        bytes at ``offset``.
+    :param int offset: Position in ``buf`` to write the packets at, default 0.
+    :param int cable: USB-MIDI cable number (0-15), default 0.
+    :returns int: Number of bytes written.
+    """
+    pos = offset
+    total = len(data) + 2
+    i = 0  # position in the whole SysEx, including SYSEX and SYSEX_END
+    while i < total:
+        count = min(3, total - i)
+        # the packet holding SYSEX_END has a CIN saying how many bytes it has
+        cin = _CIN_SYSEX if i + count < total else _CIN_SINGLE + count - 1
+        buf[pos] = cable << 4 | cin
+        for j in range(3):
+            k = i + j
+            if j >= count:
+                b = 0
+            elif k == 0:
+                b = tmidi.SYSEX
+            elif k == total - 1:
+                b = tmidi.SYSEX_END
+            else:
+                b = data[k - 1]
+            buf[pos + 1 + j] = b
+        pos += 4
+        i += count
+    return pos - offset
+
+
+class PacketDecoder:
+    """
+    Decoder of USB-MIDI event packets into Messages.
+
+    :param int cable_mask: Bit mask of the cables to decode, bit N for cable N,
+        default 0xFFFF (all cables). Packets for other cables are skipped.
+    :param int sysex_size: Size of the per-cable buffer SysEx payloads are
+        collected into, default 0, which skips SysEx payloads.
+        Longer SysEx payloads are truncated and counted as an error.
+
+    Example of decoding a USB Host MIDI device's transfers:
+
+    .. code-block:: python
+
+        import tmidi_usb
+        decoder = tmidi_usb.PacketDecoder()
+        buf = bytearray(64)
+        while True:
+            try:
+                count = device.read(in_endpoint, buf, timeout=5)
+            except usb.core.USBTimeoutError:
+                continue
+            for cable, msg in decoder.decode(buf, count):
+                print(cable, msg)
+    """
+
+    def __init__(self, cable_mask=0xFFFF, sysex_size=0):
+        self.cable_mask = cable_mask
+        self._sysex_size = sysex_size
+        # per-cable SysEx buffers, created for a cable when it first sends SysEx
+        self._sysex_bufs = [None] * 16
+        self._sysex_lens = [0] * 16
+        self._error_count = 0
+
+    @property
+    def error_count(self):
+        """Number of errors encountered when decoding packets"""
+        return self._error_count
+
+    def sysex_data(self, cable):
+        """The payload of the SysEx last completed on a cable, as a ``memoryview``.
+        Only valid until more packets for that cable are decoded.
+
+        :param int cable: USB-MIDI cable number (0-15).
+        """
+        sysex_buf = self._sysex_bufs[cable]
+        if sysex_buf is None:
+            return memoryview(b"")
+        return memoryview(sysex_buf)[: min(self._sysex_lens[cable], self._sysex_size)]
+
+    def decode(self, buf, nbytes=None, msg=None):
+        """Decode the event packets in a USB transfer.
+
+        :param buf: The bytes of the USB transfer.
+        :param int nbytes: Number of bytes in ``buf`` to decode, default ``len(buf)``.
+        :param Message msg: If set, this Message is filled in and yielded
+            for every event, instead of allocating new ones.
+        :returns: A generator of ``(cable, Message)`` tuples. A completed SysEx is
+            yielded as a SYSEX Message, its payload is in ``sysex_data(cable)``.
+        """
+        if nbytes is None:
+            nbytes = len(buf)
+        for pos in range(0, nbytes - 3, 4):
+            header = buf[pos]
+            cable = header >> 4
+            if not self.cable_mask & (1 << cable):
+                continue
+            cin = header & 0x0F
+            status_byte = buf[pos + 1]
+            if _CIN_SYSEX <= cin <= _CIN_SYSEX_END_3 and (
+                cin != _CIN_SINGLE or status_byte == tmidi.SYSEX_END
+            ):
+                if self._sysex_packet(cable, buf, pos + 1, _CIN_LEN[cin]):
+                    yield cable, self._message(msg, tmidi.SYSEX, 0, 0)
+                continue
+            data_len = _CIN_LEN[cin]
+            if not data_len or not status_byte & 0x80:
+                self._error_count += 1
+                continue
+            yield (
+                cable,
+                self._message(
+                    msg,
+                    status_byte,
+                    buf[pos + 2] if data_len > 1 else 0,
+                    buf[pos + 3] if data_len > 2 else 0,
+                ),
+            )
+
+    def _sysex_packet(self, cable, buf, pos, count):
+        # Collect the bytes of a SysEx packet, returns True if the SysEx has ended
+        sysex_buf = self._sysex_bufs[cable]
+        if sysex_buf is None and self._sysex_size:
+            sysex_buf = self._sysex_bufs[cable] = bytearray(self._sysex_size)
+        for i in range(pos, pos + count):
+            b = buf[i]
+            if b == tmidi.SYSEX:
+                self._sysex_lens[cable] = 0
+            elif b == tmidi.SYSEX_END:
+                return True
+            elif self._sysex_lens[cable] < self._sysex_size:
+                sysex_buf[self._sysex_lens[cable]] = b
+                self._sysex_lens[cable] += 1
+            elif self._sysex_size and self._sysex_lens[cable] == self._sysex_size:
+                # too long, count the truncated SysEx as one error
+                self._error_count += 1
+                self._sysex_lens[cable] += 1
+        return False
+
+    @staticmethod
+    def _message(msg, status_byte, data0, data1):
+        if msg is None:
+            msg = tmidi.Message()
+        if tmidi.NOTE_OFF <= status_byte < tmidi.SYSEX:
+            msg.type = status_byte & 0xF0
+            msg.channel = status_byte & 0x0F
+        else:
+            msg.type = status_byte
+            msg.channel = 0
+        msg.data0 = data0
+        msg.data1 = data1
+        return msg